@@ -5,11 +5,19 @@ import io
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import hmac
 import os
-from flask import Flask, request, jsonify, session, render_template
+import time
+import zlib
+from flask import Flask, Response, g, request, jsonify, session, render_template
 from flask_cors import CORS
-from datetime import timedelta
-from ingress_tracker import IngressHackTracker
+from datetime import datetime, timedelta
+from ingress_tracker import IngressHackTracker, VALID_CREDENTIALS, range_bound_keys
+from storage import open_read_only, sqlite_file
+from jobs import JobQueue
+from tracker_pool import TrackerPool
+from response_cache import ResponseCache
+from metrics import registry as metrics
 
 # 確保 app 實例在全域（gunicorn app:app 需要）
 app = Flask(__name__)
@@ -27,23 +35,137 @@ app.config['SESSION_COOKIE_SECURE'] = True
 # 告訴伺服器只接受來自您 GitHub Pages 網站的請求
 CORS(app, origins=["https://tulacu.github.io"], supports_credentials=True, allow_headers="*")
 
-# 創建一個全域的 tracker 實例。在真實的多人應用中，你可能需要為每個用戶管理數據。
-# 但根據原始腳本的設計，這是一個共享的追蹤器。
+# 每位使用者的資料各自存放在 USER_DATA_DIR/<使用者>/ 底下，第一次用到時才載入；
+# 同時最多保留 TRACKER_POOL_SIZE 個使用者的資料在記憶體，淘汰時先寫回
+USER_DATA_DIR = os.environ.get('USER_DATA_DIR', 'user_data')
+TRACKER_POOL_SIZE = int(os.environ.get('TRACKER_POOL_SIZE', '8'))
+# 改版前所有使用者共用的資料與 CSV：使用者第一次建立自己的資料時以此為起點
+SHARED_DATA_FILE = 'ingress_hack_data.json'
+SHARED_CSV_FILE = 'ingress_hack_data.csv'
 
-tracker = IngressHackTracker()
-# 啟動時自動載入本地 CSV（假設是 tab 分隔，欄位名稱為中文）
-csv_path = 'ingress_hack_data.csv'
-if os.path.exists(csv_path):
-    tracker.load_from_csv(csv_path)
+def shared_data_exists() -> bool:
+    stem = os.path.splitext(SHARED_DATA_FILE)[0]
+    return (any(os.path.exists(stem + suffix) for suffix in ('.json', '.bin', '.csv'))
+            or os.path.exists(sqlite_file(SHARED_DATA_FILE)))
+
+def seed_user_data(user_tracker: IngressHackTracker):
+    """
+    複製共用的資料，使用者原本看得到的記錄不會因為改成分開存放而消失。
+    共用資料以唯讀方式讀取（不轉換格式、不改動共用檔案）；共用的 GitHub 設定含 token，不複製給使用者
+    """
+    try:
+        shared = open_read_only(None, SHARED_DATA_FILE, user_tracker.item_columns)
+        if shared is not None:
+            with user_tracker._write_lock:
+                shared.load(user_tracker.hack_data)
+                user_tracker.save_data()
+        # 一併匯入本地 CSV（已存在的記錄會略過）
+        if os.path.exists(SHARED_CSV_FILE):
+            user_tracker.load_from_csv(SHARED_CSV_FILE)
+        print(f"📥 已從共用資料建立 {user_tracker.current_user} 的資料（{len(user_tracker.hack_data)} 筆）")
+    except Exception as e:
+        print(f"⚠️ 複製共用資料失敗：{e}")
+
+def user_data_dir(username: str) -> str:
+    """使用者自己的資料夾（資料檔、GitHub 設定、背景工作狀態）"""
+    return os.path.join(USER_DATA_DIR, secure_filename(username or '') or '_')
+
+def create_user_tracker(username: str) -> IngressHackTracker:
+    """載入（或第一次建立）使用者自己的追蹤器"""
+    user_dir = user_data_dir(username)
+    is_new = not os.path.isdir(user_dir)
+    os.makedirs(user_dir, exist_ok=True)
+    user_tracker = IngressHackTracker(
+        data_file=os.path.join(user_dir, 'ingress_hack_data.json'),
+        config_file=os.path.join(user_dir, 'github_config.json')
+    )
+    # 網頁端的登入由 session 控制，tracker 本身視為已登入（否則寫入類的方法都會被 check_auth 擋下）
+    user_tracker.authenticated = True
+    user_tracker.current_user = username
+    if is_new and shared_data_exists():
+        seed_user_data(user_tracker)
+    # 重新載入後資料版本從頭計算，舊的快取內容不能再用
+    response_cache.invalidate(username)
+    return user_tracker
+
+trackers = TrackerPool(create_user_tracker, TRACKER_POOL_SIZE)
+
+# GitHub 同步／上傳在背景執行，不佔住處理請求的 worker；
+# 工作狀態存在使用者資料夾，多 worker 部署時任何一個行程都查得到
+jobs = JobQueue(state_dir=user_data_dir)
 
-# --- 輔助函數 ---
 # --- 輔助函數 ---
 def is_authenticated():
     """檢查使用者是否已登入"""
     return session.get('authenticated', False)
 
+def current_tracker() -> IngressHackTracker:
+    """目前登入使用者的追蹤器（呼叫前需確認已登入）"""
+    return trackers.get(session['username'])
+
+# 讀取類 API 的回應依使用者與資料版本快取（需在 is_authenticated 定義之後建立）
+response_cache = ResponseCache(lambda: current_tracker().data_version, guard=is_authenticated,
+                               scope_func=lambda: session['username'])
+
+def import_summary(tracker: IngressHackTracker, added: int) -> dict:
+    """匯入／同步後只回傳筆數與最新游標，不回傳整份資料"""
+    return {'added': added, 'total_records': len(tracker.hack_data), 'cursor': tracker.latest_cursor()}
+
+def github_job_key(tracker: IngressHackTracker, kind: str) -> tuple:
+    """同一位使用者、同一個 repo／檔案的同類工作會合併成一個"""
+    return (kind, tracker.current_user, tracker.github_config.get('repo'), tracker.github_config.get('filename'))
+
+def job_accepted(job: dict):
+    """回傳 202 與工作狀態，前端依 status_url 輪詢結果"""
+    response = jsonify({**job, 'status_url': f"/api/jobs/{job['job_id']}"})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/jobs/{job['job_id']}"
+    return response
+
 # --- API Endpoints (路由) ---
 
+# 處理時間超過這個毫秒數的請求會印出 [SLOW] 記錄；0 表示不記錄
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', '0'))
+
+metrics.gauge('tracker_records', '記憶體中（已載入的使用者）的記錄筆數',
+              lambda: sum(len(t.hack_data) for t in trackers.loaded()))
+metrics.gauge('tracker_pending_writes', '延後寫入中、尚未落盤的記錄筆數',
+              lambda: sum(t.pending_count() for t in trackers.loaded()))
+metrics.gauge('tracker_pool_loaded', '目前載入中的使用者追蹤器數', lambda: len(trackers))
+metrics.counter('tracker_pool_loads_total', '載入使用者追蹤器的次數', lambda: trackers.loads)
+metrics.counter('tracker_pool_evictions_total', '淘汰使用者追蹤器的次數', lambda: trackers.evictions)
+metrics.counter('response_cache_hits_total', '回應快取命中次數', lambda: response_cache.hits)
+metrics.counter('response_cache_misses_total', '回應快取未命中次數', lambda: response_cache.misses)
+
+@app.before_request
+def start_request_timer():
+    """記錄請求開始時間（需在其他 before_request 之前註冊，才會把它們的耗時算進去）"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """記錄每個端點的延遲、回應大小與狀態碼"""
+    started = getattr(g, 'request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # 以路由樣式（而非實際路徑）當標籤，避免每個 job id 各成一組
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe('http_request_duration_seconds', elapsed, method=request.method, endpoint=endpoint)
+    metrics.inc('http_requests_total', method=request.method, endpoint=endpoint, status=response.status_code)
+    if not response.is_streamed:
+        metrics.observe('http_response_size_bytes', response.calculate_content_length() or 0,
+                        method=request.method, endpoint=endpoint)
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        print(f"[SLOW] {request.method} {request.full_path.rstrip('?')} {response.status_code} {elapsed * 1000:.1f} ms")
+    return response
+
+@app.before_request
+def refresh_shared_data():
+    """其他 worker 或外部程式修改過使用者的資料時，只載入新增的部分，讓各 worker 資料一致"""
+    if request.path.startswith('/api/') and is_authenticated():
+        current_tracker().refresh_data()
+
 # --- 上傳 CSV API ---
 @app.route('/api/upload_csv', methods=['POST'])
 def upload_csv():
@@ -53,13 +175,14 @@ def upload_csv():
         print("[LOG] 未登入，拒絕上傳")
         return jsonify({'error': '請先登入'}), 401
 
+    tracker = current_tracker()
     # 支援前端直接傳 csv 字串
     csv_content = request.form.get('csv')
     if csv_content:
         try:
             count = tracker.load_from_csv_content(csv_content)
             print(f"[LOG] CSV 字串上傳並載入成功，新增 {count} 筆")
-            return jsonify({'status': 'success', 'message': f'CSV 已上傳並載入，新增 {count} 筆', 'data': tracker.hack_data})
+            return jsonify({'status': 'success', 'message': f'CSV 已上傳並載入，新增 {count} 筆', **import_summary(tracker, count)})
         except Exception as e:
             print(f"[LOG] CSV 字串載入失敗: {e}")
             return jsonify({'status': 'error', 'message': f'CSV 載入失敗: {e}'}), 500
@@ -71,9 +194,9 @@ def upload_csv():
             print("[LOG] 未選擇檔案")
             return jsonify({'error': '未選擇檔案'}), 400
         try:
-            tracker.load_from_csv(file.stream)
-            print("[LOG] CSV 檔案上傳並載入成功")
-            return jsonify({'status': 'success', 'message': 'CSV 已上傳並載入', 'data': tracker.hack_data})
+            count = tracker.load_from_csv(file.stream)
+            print(f"[LOG] CSV 檔案上傳並載入成功，新增 {count} 筆")
+            return jsonify({'status': 'success', 'message': f'CSV 已上傳並載入，新增 {count} 筆', **import_summary(tracker, count)})
         except Exception as e:
             print(f"[LOG] CSV 檔案載入失敗: {e}")
             return jsonify({'status': 'error', 'message': f'CSV 載入失敗: {e}'}), 500
@@ -93,7 +216,7 @@ def login():
     username = data.get('username')
     password = data.get('password')
 
-    if username in tracker.valid_credentials and tracker.valid_credentials[username] == password:
+    if username in VALID_CREDENTIALS and VALID_CREDENTIALS[username] == password:
         session['authenticated'] = True
         session['username'] = username
         session.permanent = True # 使用 PERMANENT_SESSION_LIFETIME
@@ -115,44 +238,205 @@ def auth_status():
     return jsonify({'authenticated': False})
 
 @app.route('/api/data', methods=['GET', 'POST', 'DELETE'])
+@response_cache.cached
 def handle_data():
     """處理數據的獲取、新增和刪除"""
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
 
     if request.method == 'GET':
-        return jsonify(tracker.hack_data)
+        # 分頁參數：cursor（上一頁的 next_cursor）、since（時間戳記）、limit、fields（逗號分隔）
+        fields = request.args.get('fields')
+        try:
+            page = tracker.get_records_page(
+                cursor=request.args.get('cursor') or None,
+                since=request.args.get('since') or None,
+                limit=min(int(request.args.get('limit', 500)), 5000),
+                fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None
+            )
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        return jsonify(page)
     
     if request.method == 'POST':
         hack_record = request.get_json()
         hack_count = hack_record.get('hackCount', 1)
         items = {col: hack_record.get(col, 0) for col in tracker.item_columns}
         
-        if tracker.add_hack_data(hack_count, **items):
+        try:
+            added = tracker.add_hack_data(hack_count, **items)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        if added:
             return jsonify({'status': 'success', 'message': '資料已新增'})
         return jsonify({'status': 'error', 'message': '新增資料失敗'}), 500
 
     if request.method == 'DELETE':
-        if tracker.clear_all_data():
+        if tracker.clear_data():
              return jsonify({'status': 'success', 'message': '所有資料已清空'})
-        return jsonify({'status': 'error', 'message': '清空資料失敗，或操作被取消'}), 500
+        return jsonify({'status': 'error', 'message': '清空資料失敗'}), 500
+
+@app.route('/api/data/batch', methods=['POST'])
+def handle_data_batch():
+    """批次新增數據 API：接受記錄陣列（或 {"records": [...]}），一次驗證、寫入與儲存"""
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+
+    payload = request.get_json(silent=True)
+    records = payload.get('records') if isinstance(payload, dict) else payload
+    if not isinstance(records, list):
+        return jsonify({'status': 'error', 'message': '請傳入記錄陣列'}), 400
+    if len(records) > 10000:
+        return jsonify({'status': 'error', 'message': '單次最多 10000 筆'}), 400
+
+    try:
+        added = tracker.add_hack_data_many(records)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'message': f'已新增 {added} 筆', **import_summary(tracker, added)})
 
 @app.route('/api/stats', methods=['GET'])
+@response_cache.cached
 def get_stats():
     """獲取統計數據 API"""
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
     return jsonify(tracker.get_stats())
 
+@app.route('/api/stats/items', methods=['GET'])
+@response_cache.cached
+def get_item_stats():
+    """獲取各物資統計 API（總量、比例、平均每次 Hack 獲得量）"""
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+    return jsonify(tracker.get_item_stats())
+
+@app.route('/api/stats/timeseries', methods=['GET'])
+@response_cache.cached
+def get_timeseries():
+    """獲取依時間彙總的趨勢數據 API（bucket=hour/day/week, from=, to=）"""
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+    try:
+        series = tracker.get_timeseries(
+            request.args.get('bucket', 'day'),
+            request.args.get('from') or None,
+            request.args.get('to') or None
+        )
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'bucket': request.args.get('bucket', 'day'), 'series': series})
+
+@app.route('/api/charts/<kind>.png', methods=['GET'])
+def get_chart(kind):
+    """伺服器端渲染圖表 API（kind=items/ratio/distribution，width=, height=, dpi=）"""
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+    try:
+        width = min(max(int(request.args.get('width', 800)), 100), 4000)
+        height = min(max(int(request.args.get('height', 600)), 100), 4000)
+        dpi = min(max(int(request.args.get('dpi', 100)), 50), 300)
+        png = tracker.render_chart(kind, width, height, dpi)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    response = Response(png, mimetype='image/png')
+    # 圖表隨資料變動，瀏覽器每次都要回來問（伺服器端有快取，成本很低）
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def parse_confidence() -> float:
+    """讀取 confidence 參數（預設 0.95）"""
+    return float(request.args.get('confidence', 0.95))
+
+def analysis_job(tracker: IngressHackTracker, kind: str, compute, params: tuple):
+    """
+    bootstrap 需要大量重抽樣（百萬筆時要十秒以上），不在請求中計算：
+    送到背景工作並回傳 202；同一位使用者、相同參數與資料版本的請求合併成同一個工作
+    """
+    key = (kind, tracker.current_user, tracker.data_version) + params
+    return job_accepted(jobs.submit(kind, compute, key=key, owner=tracker.current_user))
+
+@app.route('/api/stats/drop-rates', methods=['GET'])
+@response_cache.cached
+def get_drop_rates():
+    """
+    各物資掉落率與信賴區間 API（method=poisson/normal/bootstrap, confidence=, from=, to=）
+    method=bootstrap 時回傳 202 與背景工作，結果由 /api/jobs/<id> 取得
+    """
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+    method = request.args.get('method', 'poisson')
+    start = request.args.get('from') or None
+    end = request.args.get('to') or None
+    try:
+        confidence = parse_confidence()
+        if method == 'bootstrap':
+            range_bound_keys(start, end)
+            return analysis_job(tracker, 'drop_rates',
+                                lambda: tracker.get_drop_rates(method, confidence, start, end),
+                                (confidence, start, end))
+        result = tracker.get_drop_rates(method, confidence, start, end)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/api/stats/drop-rates/compare', methods=['GET'])
+@response_cache.cached
+def compare_drop_rates():
+    """
+    比較兩段期間的掉落率 API（a_from=, a_to=, b_from=, b_to=, method=, confidence=）
+    method=bootstrap 時回傳 202 與背景工作，結果由 /api/jobs/<id> 取得
+    """
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+    period_a = (request.args.get('a_from') or None, request.args.get('a_to') or None)
+    period_b = (request.args.get('b_from') or None, request.args.get('b_to') or None)
+    method = request.args.get('method', 'normal')
+    try:
+        confidence = parse_confidence()
+        if method == 'bootstrap':
+            range_bound_keys(*period_a)
+            range_bound_keys(*period_b)
+            return analysis_job(tracker, 'drop_rates_compare',
+                                lambda: tracker.compare_drop_rates(period_a, period_b, method, confidence),
+                                (confidence, period_a, period_b))
+        result = tracker.compare_drop_rates(period_a, period_b, method, confidence)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify(result)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Prometheus 格式的效能指標，需要登入；
+    有設定環境變數 METRICS_TOKEN 時，監控程式也可以帶 Authorization: Bearer <token> 讀取
+    """
+    token = os.environ.get('METRICS_TOKEN')
+    bearer = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(bearer.encode(), f'Bearer {token}'.encode())
+    if not token_ok and not is_authenticated():
+        return jsonify({'error': '未授權'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/github/config', methods=['GET', 'POST'])
 def github_config():
     """處理 GitHub 設定的儲存與載入"""
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
         
     if request.method == 'POST':
         config = request.get_json()
-        tracker.save_github_config(config['repo'], config['token'], config['filename'])
+        tracker.save_github_config(config['repo'], config['token'], config['filename'],
+                                   config.get('api_url'), config.get('layout', 'single'))
         return jsonify({'status': 'success', 'message': 'GitHub 設定已儲存'})
     
     if request.method == 'GET':
@@ -163,31 +447,91 @@ def sync_from_github():
     """從 GitHub 同步資料 API"""
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
     
-    success = tracker.sync_from_github()
-    if success:
-        return jsonify({'status': 'success', 'message': '同步成功', 'data': tracker.hack_data})
-    return jsonify({'status': 'error', 'message': '同步失敗'}), 500
+    def run_sync():
+        before = len(tracker.hack_data)
+        if not tracker.sync_from_github():
+            raise RuntimeError('同步失敗')
+        return {'message': '同步成功', **import_summary(tracker, len(tracker.hack_data) - before)}
+
+    return job_accepted(jobs.submit('github_sync', run_sync, key=github_job_key(tracker, 'sync'),
+                                    owner=tracker.current_user))
 
 @app.route('/api/github/upload', methods=['POST'])
 def upload_to_github():
     """上傳資料到 GitHub API"""
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
         
-    success = tracker.upload_to_github()
-    if success:
-        return jsonify({'status': 'success', 'message': '上傳成功'})
-    return jsonify({'status': 'error', 'message': '上傳失敗'}), 500
+    def run_upload():
+        if not tracker.upload_to_github():
+            raise RuntimeError('上傳失敗')
+        return {'message': '上傳成功'}
+
+    return job_accepted(jobs.submit('github_upload', run_upload, key=github_job_key(tracker, 'upload'),
+                                    owner=tracker.current_user))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """查詢背景工作狀態 API（status：queued / running / success / error）"""
+    if not is_authenticated():
+        return jsonify({'error': '請先登入'}), 401
+    job = jobs.get(job_id, owner=session.get('username'))
+    # 只能查詢自己送出的工作
+    if job is None or job['owner'] != session.get('username'):
+        return jsonify({'status': 'error', 'message': '找不到此工作'}), 404
+    return jsonify(job)
 
 @app.route('/api/export/csv', methods=['GET'])
 def export_csv():
-    """匯出 CSV API"""
+    """
+    串流匯出 CSV API
+    參數：from / to（ISO 時間，皆包含）、gzip=1（下載 .csv.gz）
+    """
     if not is_authenticated():
         return jsonify({'error': '請先登入'}), 401
+    tracker = current_tracker()
+
+    start = request.args.get('from') or None
+    end = request.args.get('to') or None
+    use_gzip = request.args.get('gzip') in ('1', 'true')
+    try:
+        lines = tracker.iter_csv_lines(start, end)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    def generate():
+        # 每累積約 64KB 送出一次，記憶體用量固定
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if use_gzip else None
+        # 標題列立刻送出，讓下載馬上開始
+        chunk = (next(lines) + '\n').encode('utf-8')
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else chunk
+        buffer, size = [], 0
+        for line in lines:
+            buffer.append(line)
+            size += len(line) + 1
+            if size >= 65536:
+                chunk = ('\n'.join(buffer) + '\n').encode('utf-8')
+                buffer, size = [], 0
+                chunk = compressor.compress(chunk) if compressor else chunk
+                if chunk:
+                    yield chunk
+        chunk = ('\n'.join(buffer) + '\n').encode('utf-8') if buffer else b''
+        if compressor:
+            chunk = compressor.compress(chunk) + compressor.flush()
+        if chunk:
+            yield chunk
 
-    csv_content = tracker.generate_csv_content()
-    return jsonify({'filename': f"ingress_hack_data_{tracker.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv", 'content': csv_content})
+    filename = f"ingress_hack_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    if use_gzip:
+        filename += '.gz'
+    return Response(
+        generate(),
+        mimetype='application/gzip' if use_gzip else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
 
 # --- 啟動伺服器 ---
 if __name__ == '__main__':
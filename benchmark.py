@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+效能基準測試
+
+以固定亂數種子產生擬真的 hack 記錄（1k / 10k / 100k / 1M 筆），量測追蹤器各熱點操作
+與 Flask 端點（透過 test client）的耗時與峰值記憶體，結果寫成 JSON 方便比較。
+
+用法：
+    python benchmark.py                              # 預設 1k、10k、100k、1M
+    python benchmark.py --sizes 1000,10000 -o result.json
+    python benchmark.py --sizes 10000 --compare baseline.json   # 比基準慢超過 --tolerance 時以 1 結束
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# 各物資每次 hack 的出現機率與最大數量（粗略依實際掉落比例）
+ITEM_PROFILE = {
+    'L7Res': (0.45, 3), 'L8Res': (0.35, 2), 'L7XMP': (0.55, 4), 'L8XMP': (0.40, 3),
+    'L7US': (0.30, 2), 'L8US': (0.20, 2), 'L7PC': (0.08, 1), 'L8PC': (0.05, 1),
+    'Cshield': (0.10, 1), 'Rshield': (0.05, 1), 'VRShield': (0.02, 1), 'AXAShield': (0.01, 1),
+    'Else': (0.05, 1), 'Cmod': (0.06, 1), 'Rmod': (0.03, 1), 'VRmod': (0.01, 1), 'Virus': (0.01, 1)
+}
+
+
+def generate_records(count: int, seed: int = 42, start: datetime = datetime(2024, 1, 1)) -> List[Dict]:
+    """產生 count 筆固定內容的記錄（相同 seed 結果相同），時間戳記遞增且不重複"""
+    rng = random.Random(seed)
+    moment = start
+    records = []
+    for _ in range(count):
+        moment += timedelta(seconds=rng.randint(30, 1800), microseconds=rng.randint(0, 999999))
+        record = {'timestamp': moment.isoformat(), 'hackCount': 1 if rng.random() < 0.9 else rng.randint(2, 4)}
+        for column, (probability, maximum) in ITEM_PROFILE.items():
+            record[column] = rng.randint(1, maximum) if rng.random() < probability else 0
+        records.append(record)
+    return records
+
+
+def measure(func: Callable, repeat: int = 5, setup: Optional[Callable] = None, memory: bool = True) -> Dict:
+    """
+    執行 func repeat 次量測耗時（setup 的回傳值會傳給 func，不計時），
+    另外在 tracemalloc 下再執行一次量測峰值記憶體（追蹤本身會拖慢速度，所以不與計時混用）
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    result = {
+        'repeat': repeat,
+        'min_s': min(timings),
+        'median_s': statistics.median(timings),
+    }
+    if memory:
+        args = (setup(),) if setup else ()
+        tracemalloc.start()
+        try:
+            func(*args)
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_size(size: int, storage: str, repeat: int, memory: bool, workdir: str) -> Dict:
+    """在 workdir 裡建立 size 筆資料的追蹤器並量測各項操作"""
+    import app as flask_app
+    from ingress_tracker import IngressHackTracker
+
+    data_file = os.path.join(workdir, f'bench_{size}.json')
+    records = generate_records(size)
+    # 大資料量時重複次數減少，避免單次跑太久
+    heavy_repeat = max(1, repeat if size <= 100000 else repeat // 3)
+    results = {}
+
+    def new_tracker(name: str = data_file):
+        tracker = IngressHackTracker(data_file=name, storage=storage)
+        tracker.authenticated = True
+        return tracker
+
+    tracker = new_tracker()
+    started = time.perf_counter()
+    tracker.add_hack_data_many(records)
+    results['add_hack_data_many'] = {'repeat': 1, 'min_s': time.perf_counter() - started}
+    results['add_hack_data_many']['median_s'] = results['add_hack_data_many']['min_s']
+
+    results['add_hack_data'] = measure(lambda: tracker.add_hack_data(1, L7Res=1), repeat * 4, memory=memory)
+
+    counter = iter(range(10 ** 6))
+    scratch = []
+
+    def scratch_tracker(write_behind: bool):
+        # 與主追蹤器同樣筆數的暫用追蹤器（建立不計時），連續新增的記錄不會留到後面的量測項目
+        def setup():
+            target = new_tracker(os.path.join(workdir, f'scratch_{size}_{next(counter)}.json'))
+            target.add_hack_data_many(records)
+            target.write_behind = write_behind
+            scratch.append(target)
+            return target
+        return setup
+
+    def burst(target, count: int = 1000):
+        # 連續新增後呼叫 flush()：延後寫入時合併成少數幾次寫入並 fsync；
+        # 沒有延後寫入時每筆各寫一次日誌，但不 fsync（持久性較弱，只作參考）
+        for _ in range(count):
+            target.add_hack_data(1, L7Res=1)
+        target.flush()
+
+    stamps = (f'2100-01-01T00:00:00.{i:06d}' for i in range(10 ** 6))
+
+    def durable_burst(target, count: int = 1000):
+        # 每筆回傳前都已 fsync（add_hack_data_many 以 sync=True 寫入）：與延後寫入 + flush() 的持久性相同
+        for _ in range(count):
+            target.add_hack_data_many([{'timestamp': next(stamps), 'L7Res': 1}])
+
+    results['add_hack_data x1000 (no fsync)'] = measure(burst, heavy_repeat, setup=scratch_tracker(False),
+                                                        memory=memory)
+    results['add_hack_data x1000 (fsync each)'] = measure(durable_burst, heavy_repeat, setup=scratch_tracker(False),
+                                                          memory=memory)
+    results['add_hack_data x1000 (write-behind)'] = measure(
+        burst, heavy_repeat, setup=scratch_tracker(True), memory=memory)
+    for target in scratch:
+        target.close()
+    results['save_data'] = measure(tracker.save_data, heavy_repeat, memory=memory)
+    results['load_data'] = measure(tracker.load_data, heavy_repeat, memory=memory)
+    results['get_stats'] = measure(tracker.get_stats, repeat * 4, memory=memory)
+    results['get_item_stats'] = measure(tracker.get_item_stats, repeat * 4, memory=memory)
+    results['get_timeseries_day'] = measure(lambda: tracker.get_timeseries('day'), repeat, memory=memory)
+
+    csv_content = tracker.generate_csv_content()
+    results['generate_csv_content'] = measure(tracker.generate_csv_content, heavy_repeat, memory=memory)
+    results['csv_bytes'] = len(csv_content.encode('utf-8'))
+
+    def fresh_tracker():
+        # 每次匯入都用空的追蹤器，量到的是完整解析與寫入，而不是去重
+        return new_tracker(os.path.join(workdir, f'csv_{size}_{next(counter)}.json'))
+
+    results['load_from_csv_content'] = measure(
+        lambda target: target.load_from_csv_content(csv_content), heavy_repeat, setup=fresh_tracker, memory=memory)
+
+    # 端點：把這個追蹤器當成 benchmark 使用者的資料，第一次（未快取）與之後（快取命中）分開記錄
+    flask_app.trackers.put('benchmark', tracker)
+    flask_app.response_cache.invalidate('benchmark')
+    client = flask_app.app.test_client()
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+        session['username'] = 'benchmark'
+    endpoints = {
+        'GET /api/stats': '/api/stats',
+        'GET /api/stats/items': '/api/stats/items',
+        'GET /api/stats/timeseries': '/api/stats/timeseries?bucket=day',
+        'GET /api/data?limit=500': '/api/data?limit=500',
+        'GET /api/export/csv': '/api/export/csv',
+    }
+    for name, url in endpoints.items():
+        tracker.add_hack_data(1, L8Res=1)  # 讓資料版本改變，第一次請求不會命中快取
+        results[f'{name} (cold)'] = measure(lambda: client.get(url).get_data(), 1, memory=False)
+        results[f'{name} (warm)'] = measure(lambda: client.get(url).get_data(), repeat, memory=memory)
+
+    results['snapshot_bytes'] = sum(
+        os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir)
+        if name.startswith(f'bench_{size}.')
+    )
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """找出比基準慢超過 tolerance 比例的項目（只比較兩邊都有的資料量與操作）"""
+    regressions = []
+    for size, operations in current['results'].items():
+        for name, result in operations.items():
+            base = baseline.get('results', {}).get(size, {}).get(name)
+            if not isinstance(result, dict) or not isinstance(base, dict):
+                continue
+            # 太短的操作誤差大不判斷：重複量測的低於 1 ms、只量一次的低於 5 ms
+            floor = 0.001 if base.get('repeat', 1) > 1 else 0.005
+            if base['min_s'] >= floor and result['min_s'] > base['min_s'] * (1 + tolerance):
+                regressions.append(f"{size} 筆 {name}：{base['min_s'] * 1000:.2f} ms → {result['min_s'] * 1000:.2f} ms")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Ingress Hack 追蹤器效能基準測試")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="逗號分隔的資料筆數")
+    parser.add_argument('--storage', default='binary', help="儲存後端（binary / json / sqlite）")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help="不量測峰值記憶體")
+    parser.add_argument('-o', '--output', default=None, help="結果 JSON 檔名")
+    parser.add_argument('--compare', default=None, help="與這份結果 JSON 比較")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允許比基準慢的比例")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output = os.path.abspath(output)
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'storage': args.storage,
+            'repeat': args.repeat,
+        },
+        'results': {}
+    }
+
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, project_dir)
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='ingress_bench_') as workdir:
+        # 追蹤器與 app 會在目前目錄讀寫設定檔，全部放在暫存目錄裡
+        os.chdir(workdir)
+        stdout = sys.stdout
+        try:
+            for size in sizes:
+                print(f"⏱️ 量測 {size} 筆…", file=stdout, flush=True)
+                # 追蹤器的操作訊息很多，量測期間不輸出
+                sys.stdout = io.StringIO()
+                try:
+                    report['results'][str(size)] = run_size(size, args.storage, args.repeat,
+                                                            not args.no_memory, workdir)
+                finally:
+                    sys.stdout = stdout
+                for name, result in report['results'][str(size)].items():
+                    if isinstance(result, dict):
+                        peak = f"  峰值 {result['peak_bytes'] / 1024 / 1024:.1f} MB" if 'peak_bytes' in result else ''
+                        print(f"   {name:<34} {result['min_s'] * 1000:>10.2f} ms{peak}")
+        finally:
+            os.chdir(original_dir)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📄 結果已寫入 {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("❌ 發現效能退步：")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("✅ 沒有超過容許範圍的退步")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+匯入時間檢查
+
+用 `python -X importtime` 量測 import 模組所花的時間，並確認 matplotlib、
+numpy、pandas、requests 這些重量級套件沒有在啟動時就被載入。
+超過預算或載入了不該載入的套件時以非 0 結束，可以放進 CI 或部署前檢查。
+
+用法：
+    python check_import_time.py                # 檢查 ingress_tracker 與 app
+    python check_import_time.py ingress_tracker --budget-ms 150
+環境變數 IMPORT_BUDGET_MS 可以覆寫預設預算。
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+DEFAULT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '300'))
+HEAVY_MODULES = ('matplotlib', 'numpy', 'pandas', 'requests')
+
+
+def measure_import(module: str):
+    """在乾淨的子程序中 import 模組，回傳 (累計微秒, 已載入的重量級套件)"""
+    probe = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import 失敗")
+
+    cumulative_us = 0
+    # importtime 格式：import time: self [us] | cumulative | imported package
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            cumulative_us = int(parts[1].strip())
+
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return cumulative_us, loaded
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="檢查模組匯入時間與重量級套件")
+    parser.add_argument('modules', nargs='*', default=['ingress_tracker', 'app'])
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        try:
+            cumulative_us, loaded = measure_import(module)
+        except RuntimeError as e:
+            print(f"❌ {module}：{e}")
+            failed = True
+            continue
+
+        elapsed_ms = cumulative_us / 1000
+        status = "✅" if elapsed_ms <= args.budget_ms and not loaded else "❌"
+        print(f"{status} {module}：{elapsed_ms:.1f} ms（預算 {args.budget_ms:.0f} ms）")
+        if elapsed_ms > args.budget_ms:
+            failed = True
+        if loaded:
+            print(f"   ⚠️ 啟動時載入了重量級套件：{', '.join(loaded)}")
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
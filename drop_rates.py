@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+掉落率統計
+每次 hack 各物資的平均掉落數（掉落率）與信賴區間，以及兩段期間的比較。
+所有計算都以 NumPy 對整欄向量化進行；輸入為每筆記錄的 hack 次數與各物資欄的陣列。
+
+區間估計方法：
+- poisson：把總掉落數視為 Poisson 計數（Byar 近似），只需要總量
+- normal：比例估計量（總掉落 / 總 hack）的 delta method 標準誤，會反映記錄之間的變異
+- bootstrap：以 Poisson bootstrap 對記錄重抽樣，取百分位區間；分塊計算，記憶體與筆數無關
+"""
+
+import math
+import warnings
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+import numpy as np
+
+METHODS = ('poisson', 'normal', 'bootstrap')
+BOOTSTRAP_SAMPLES = 1000
+# bootstrap 權重矩陣（樣本數 × 一批記錄數）每批最多的格數：
+# 每格是 8 bytes 權重加 2 bytes 查表索引，2M 格約 20 MB；批次小一點也比較容易留在快取裡
+BOOTSTRAP_MAX_CELLS = 2_000_000
+# 固定種子：同一份資料的結果可重現，快取前後一致
+BOOTSTRAP_SEED = 20240101
+
+
+def _poisson_table(resolution: int = 1 << 16) -> np.ndarray:
+    """Poisson(1) 的反累積分布查表：均勻分布的整數 -> 權重（比逐一抽 Poisson 快很多）"""
+    cdf, probability, value = [], math.exp(-1), 0
+    total = probability
+    while total < 1 - 1 / (resolution * 4):
+        cdf.append(total)
+        value += 1
+        probability /= value
+        total += probability
+    grid = (np.arange(resolution) + 0.5) / resolution
+    return np.searchsorted(np.array(cdf), grid).astype(np.float64)
+
+
+_POISSON_TABLE = _poisson_table()
+
+
+def _z(confidence: float) -> float:
+    if not 0 < confidence < 1:
+        raise ValueError(f"信賴水準必須介於 0 與 1 之間：{confidence}")
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def _totals(columns: List[np.ndarray]) -> np.ndarray:
+    return np.array([column.sum(dtype=np.int64) for column in columns], dtype=np.float64)
+
+
+def poisson_intervals(totals: np.ndarray, total_hacks: float, confidence: float):
+    """以 Byar 近似計算 Poisson 計數的區間，回傳 (下界, 上界, 標準誤)，皆為每次 hack 的掉落率"""
+    z = _z(confidence)
+    counts = np.asarray(totals, dtype=np.float64)
+    safe = np.maximum(counts, 1)
+    lower = np.where(counts > 0, counts * (1 - 1 / (9 * safe) - z / (3 * np.sqrt(safe))) ** 3, 0.0)
+    shifted = counts + 1
+    upper = shifted * (1 - 1 / (9 * shifted) + z / (3 * np.sqrt(shifted))) ** 3
+    return np.maximum(lower, 0) / total_hacks, upper / total_hacks, np.sqrt(counts) / total_hacks
+
+
+def ratio_std_errors(hacks: np.ndarray, columns: List[np.ndarray], rates: np.ndarray) -> np.ndarray:
+    """比例估計量 sum(x) / sum(h) 的 delta method 標準誤（逐欄向量化）"""
+    n = len(hacks)
+    if n < 2:
+        return np.full(len(columns), np.nan)
+    mean_hacks = hacks.mean()
+    errors = np.empty(len(columns))
+    for j, column in enumerate(columns):
+        residuals = column - rates[j] * hacks
+        errors[j] = np.sqrt(np.dot(residuals, residuals) / (n * (n - 1))) / mean_hacks
+    return errors
+
+
+def _bootstrap_chunk(samples: int) -> int:
+    """每批處理的記錄筆數，讓權重矩陣不超過 BOOTSTRAP_MAX_CELLS 格"""
+    return max(1, BOOTSTRAP_MAX_CELLS // max(1, samples))
+
+
+def bootstrap_rates(hacks: np.ndarray, columns: List[np.ndarray], samples: int = BOOTSTRAP_SAMPLES,
+                    seed: int = BOOTSTRAP_SEED) -> np.ndarray:
+    """
+    Poisson bootstrap：每筆記錄在每個樣本中的權重 ~ Poisson(1)（查表產生），
+    回傳 (樣本數 × 物資數) 的掉落率矩陣
+    """
+    rng = np.random.default_rng(seed)
+    numerators = np.zeros((samples, len(columns)))
+    denominators = np.zeros(samples)
+    chunk = _bootstrap_chunk(samples)
+    for start in range(0, len(hacks), chunk):
+        stop = min(start + chunk, len(hacks))
+        weights = _POISSON_TABLE[rng.integers(0, len(_POISSON_TABLE), size=(samples, stop - start), dtype=np.uint16)]
+        block = np.column_stack([column[start:stop] for column in columns]).astype(np.float64)
+        numerators += weights @ block
+        denominators += weights @ hacks[start:stop]
+    denominators[denominators == 0] = np.nan
+    return numerators / denominators[:, None]
+
+
+def _percentile_interval(resampled: np.ndarray, confidence: float):
+    """bootstrap 樣本的百分位區間（某段期間沒有資料時為 NaN）"""
+    tail = (1 - confidence) / 2 * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(resampled, [tail, 100 - tail], axis=0)
+
+
+def _prepare(hacks, columns):
+    return (np.asarray(hacks, dtype=np.float64),
+            [np.asarray(column, dtype=np.float64) for column in columns])
+
+
+def drop_rates(hacks, columns, method: str = 'poisson', confidence: float = 0.95,
+               samples: int = BOOTSTRAP_SAMPLES) -> Dict[str, np.ndarray]:
+    """
+    各物資的掉落率與信賴區間
+    hacks：每筆記錄的 hack 次數；columns：各物資欄每筆記錄的數量
+    回傳 {'totals', 'rates', 'lower', 'upper', 'std_errors'}，每項都是長度為物資數的陣列
+    """
+    if method not in METHODS:
+        raise ValueError(f"不支援的區間估計方法：{method}")
+    hacks, columns = _prepare(hacks, columns)
+    total_hacks = hacks.sum()
+    totals = _totals(columns)
+    if total_hacks <= 0:
+        empty = np.full(len(columns), np.nan)
+        return {'totals': totals, 'rates': empty, 'lower': empty, 'upper': empty, 'std_errors': empty}
+    rates = totals / total_hacks
+
+    if method == 'poisson':
+        lower, upper, errors = poisson_intervals(totals, total_hacks, confidence)
+    elif method == 'normal':
+        z = _z(confidence)
+        errors = ratio_std_errors(hacks, columns, rates)
+        lower, upper = np.maximum(rates - z * errors, 0), rates + z * errors
+    else:
+        _z(confidence)
+        resampled = bootstrap_rates(hacks, columns, samples)
+        lower, upper = _percentile_interval(resampled, confidence)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            errors = np.nanstd(resampled, axis=0, ddof=1)
+    return {'totals': totals, 'rates': rates, 'lower': lower, 'upper': upper, 'std_errors': errors}
+
+
+def compare_drop_rates(hacks_a, columns_a, hacks_b, columns_b, method: str = 'normal',
+                       confidence: float = 0.95, samples: int = BOOTSTRAP_SAMPLES) -> Dict[str, np.ndarray]:
+    """
+    比較兩段期間的掉落率（B − A）
+    回傳 {'a', 'b'（各自的 drop_rates 結果）, 'difference', 'lower', 'upper', 'ratio', 'p_values'}
+    """
+    if method not in METHODS:
+        raise ValueError(f"不支援的區間估計方法：{method}")
+    z = _z(confidence)
+    a = drop_rates(hacks_a, columns_a, method, confidence, samples)
+    b = drop_rates(hacks_b, columns_b, method, confidence, samples)
+    difference = b['rates'] - a['rates']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = b['rates'] / a['rates']
+
+    if method == 'bootstrap':
+        hacks_a, columns_a = _prepare(hacks_a, columns_a)
+        hacks_b, columns_b = _prepare(hacks_b, columns_b)
+        # 兩段期間各自獨立重抽樣（不同種子），差值的分布直接取百分位
+        resampled = (bootstrap_rates(hacks_b, columns_b, samples, BOOTSTRAP_SEED + 1)
+                     - bootstrap_rates(hacks_a, columns_a, samples, BOOTSTRAP_SEED))
+        lower, upper = _percentile_interval(resampled, confidence)
+        # 雙尾：差值落在 0 另一側的比例 × 2（只計算有效的樣本）
+        valid = np.isfinite(resampled)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            below = ((resampled <= 0) & valid).sum(axis=0) / valid.sum(axis=0)
+        p_values = np.minimum(1.0, 2 * np.minimum(below, 1 - below))
+    else:
+        errors = np.sqrt(a['std_errors'] ** 2 + b['std_errors'] ** 2)
+        lower, upper = difference - z * errors, difference + z * errors
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.abs(difference) / errors
+        standard = NormalDist()
+        p_values = np.array([2 * (1 - standard.cdf(score)) if np.isfinite(score) else np.nan
+                             for score in scores])
+    return {'a': a, 'b': b, 'difference': difference, 'lower': lower, 'upper': upper,
+            'ratio': ratio, 'p_values': p_values}
+
+
+def to_number(value, digits: int = 6) -> Optional[float]:
+    """numpy 數值轉成可放進 JSON 的 float（NaN / 無限大轉成 None）"""
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
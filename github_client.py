@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GitHub 檔案存取
+- 共用 requests.Session（連線重複使用）
+- 記住每個檔案的 ETag 與 blob SHA，用 If-None-Match 條件請求，沒變動時 GitHub 回 304
+- 上傳前比對內容的 blob SHA，內容沒變就不上傳，也不用先 GET 一次取得 sha
+- 超過 contents API 大小上限（1 MB）的檔案改用 Git blobs API 下載
+API 位址可用 api_url 或環境變數 GITHUB_API_URL 指定（方便接本機測試伺服器或 GitHub Enterprise）
+"""
+
+import base64
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+
+from metrics import registry
+
+# 呼叫 GitHub API 的逾時（連線, 讀取）秒數，避免 GitHub 很慢時一直卡住
+GITHUB_TIMEOUT = (5, 30)
+DEFAULT_API_URL = 'https://api.github.com'
+
+
+def git_blob_sha(content: bytes) -> str:
+    """計算與 GitHub 相同的 blob SHA（sha1("blob <長度>\\0" + 內容)）"""
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+class GitHubError(Exception):
+    """GitHub API 回傳非預期的狀態碼"""
+
+    def __init__(self, status_code: int, message: str = ''):
+        super().__init__(f"HTTP {status_code} {message}".strip())
+        self.status_code = status_code
+
+
+class GitHubClient:
+    """單一 repo 的檔案讀寫，同一個實例會快取 ETag／SHA，請重複使用"""
+
+    # 未修改時 get_file 回傳的標記
+    NOT_MODIFIED = object()
+
+    def __init__(self, repo: str, token: str, api_url: Optional[str] = None,
+                 timeout=GITHUB_TIMEOUT, session=None):
+        import requests
+        self.repo = repo
+        self.api_url = (api_url or os.environ.get('GITHUB_API_URL') or DEFAULT_API_URL).rstrip('/')
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({
+            'Authorization': f'token {token}',
+            'Accept': 'application/vnd.github.v3+json'
+        })
+        # 路徑 → {'etag': ..., 'sha': ...}
+        self.cache: Dict[str, Dict[str, str]] = {}
+
+    def _send(self, method: str, url: str, **kwargs):
+        """送出請求並記錄耗時與傳輸大小"""
+        started = time.perf_counter()
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        registry.observe('github_request_duration_seconds', time.perf_counter() - started,
+                         method=method, status=response.status_code)
+        registry.observe('github_transfer_bytes', len(response.content), method=method, direction='down')
+        if response.request.body:
+            registry.observe('github_transfer_bytes', len(response.request.body), method=method, direction='up')
+        return response
+
+    def _contents_url(self, path: str) -> str:
+        return f'{self.api_url}/repos/{self.repo}/contents/{path}'
+
+    def get_file(self, path: str, conditional: bool = True):
+        """
+        下載檔案內容（bytes）
+        檔案不存在回傳 None；conditional=True 且檔案沒變動時回傳 GitHubClient.NOT_MODIFIED
+        """
+        cached = self.cache.get(path, {})
+        headers = {}
+        if conditional and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+
+        response = self._send('GET', self._contents_url(path), headers=headers)
+        if response.status_code == 304:
+            return self.NOT_MODIFIED
+        if response.status_code == 404:
+            self.cache.pop(path, None)
+            return None
+        if response.status_code != 200:
+            raise GitHubError(response.status_code, '下載失敗')
+
+        file_data = response.json()
+        self.cache[path] = {'etag': response.headers.get('ETag', ''), 'sha': file_data['sha']}
+        # 超過 1 MB 時 contents API 不附內容（encoding 為 none），改用 blobs API
+        if file_data.get('encoding') == 'base64' and file_data.get('content'):
+            return base64.b64decode(file_data['content'])
+        if file_data.get('size', 0) == 0:
+            return b''
+        return self._get_blob(file_data['sha'])
+
+    def _get_blob(self, sha: str) -> bytes:
+        response = self._send(
+            'GET', f'{self.api_url}/repos/{self.repo}/git/blobs/{sha}',
+            headers={'Accept': 'application/vnd.github.v3.raw'}
+        )
+        if response.status_code != 200:
+            raise GitHubError(response.status_code, '下載 blob 失敗')
+        return response.content
+
+    def remote_sha(self, path: str) -> Optional[str]:
+        """取得遠端檔案目前的 blob SHA（有快取時不發請求），檔案不存在回傳 None"""
+        if path in self.cache:
+            return self.cache[path]['sha']
+        response = self._send('GET', self._contents_url(path))
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise GitHubError(response.status_code, '查詢檔案失敗')
+        # 只記 sha，不記 ETag：內容沒有下載過，下次 get_file 仍要完整下載
+        self.cache[path] = {'etag': '', 'sha': response.json()['sha']}
+        return self.cache[path]['sha']
+
+    def put_file(self, path: str, content: bytes, message: str, sha: Optional[str] = None) -> bool:
+        """
+        上傳檔案，內容與遠端相同時不上傳並回傳 False；上傳成功回傳 True
+        sha：已知的遠端 blob SHA（例如來自 manifest），可省下查詢；新檔案傳空字串
+        快取的 sha 過期（其他人改過檔案）時會重新查詢 sha 再試一次
+        """
+        new_sha = git_blob_sha(content)
+        if sha is not None and path not in self.cache:
+            self.cache[path] = {'etag': '', 'sha': sha}
+        for attempt in range(2):
+            sha = self.remote_sha(path)
+            if sha == new_sha:
+                return False
+            payload = {'message': message, 'content': base64.b64encode(content).decode('ascii')}
+            if sha:
+                payload['sha'] = sha
+            response = self._send('PUT', self._contents_url(path), json=payload)
+            if response.status_code in (200, 201):
+                # 內容已變，舊的 ETag 不再適用
+                self.cache[path] = {'etag': '', 'sha': response.json()['content']['sha']}
+                return True
+            if response.status_code in (409, 422) and attempt == 0:
+                self.cache.pop(path, None)
+                continue
+            raise GitHubError(response.status_code, '上傳失敗')
+        return False
@@ -11,15 +11,629 @@ Ingress Portal Hack 數據追蹤器
 import json
 import csv
 import os
+import atexit
 import hashlib
-from datetime import datetime
-from typing import Dict, List, Optional
-import matplotlib.pyplot as plt
-import pandas as pd
-import requests
+import threading
+import weakref
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Dict, List, Optional
+from array import array
+from collections import OrderedDict
 import base64
+import codecs
+import io
+from storage import create_storage
+from metrics import timed
+
+# matplotlib、numpy、requests 載入很慢，只在第一次用到時才 import（worker 啟動較快）
+if TYPE_CHECKING:
+    import numpy as np
+
+# 伺服器端圖表：種類 → 繪圖方法名稱；快取最多保留幾張圖
+CHART_KINDS = {
+    'items': '_draw_item_chart',
+    'ratio': '_draw_item_ratio',
+    'distribution': '_draw_items_distribution',
+}
+CHART_CACHE_SIZE = 32
+ANALYTICS_CACHE_SIZE = 32
+
+# 延後寫入（write-behind）：新增的記錄先留在記憶體，由背景執行緒合併後一次寫入並 fsync。
+# INGRESS_WRITE_BEHIND=1 開啟；最多延遲 INGRESS_FLUSH_INTERVAL 秒，累積到 INGRESS_FLUSH_MAX_PENDING 筆時提早寫入
+FLUSH_INTERVAL = float(os.environ.get('INGRESS_FLUSH_INTERVAL', '0.05'))
+FLUSH_MAX_PENDING = int(os.environ.get('INGRESS_FLUSH_MAX_PENDING', '1000'))
+
+# 開著延後寫入的追蹤器，程式結束時全部寫回（弱參照，不影響追蹤器被回收）
+_write_behind_trackers = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_on_exit():
+    for tracker in list(_write_behind_trackers):
+        tracker.flush()
+
+
+# 預設帳號密碼 (實際使用時請修改)
+VALID_CREDENTIALS = {
+    'tulacu': '611450',
+    'winnietest': 'winnie123'
+}
+
+# GitHub 分區儲存（layout=monthly）：每月一個 CSV，沒有可辨識時間的記錄放在 undated
+UNDATED_PARTITION = 'undated'
+MANIFEST_NAME = 'manifest.json'
+
+
+def partition_key(timestamp: str) -> str:
+    """記錄所屬的月份分區（YYYY-MM）"""
+    parsed = parse_timestamp(timestamp)
+    return parsed.strftime('%Y-%m') if parsed else UNDATED_PARTITION
+
+# 匯入的 CSV 時間格式不一定是 ISO，依序嘗試這些格式
+TIMESTAMP_FORMATS = ['%Y/%m/%d %H:%M:%S', '%Y/%m/%d %H:%M', '%Y/%m/%d']
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """解析記錄的時間戳記，無法辨識時回傳 None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def timestamp_sort_key(value: str) -> str:
+    """
+    排序與區間比較用的鍵：ISO 格式（YYYY-MM-DD 或 YYYY-MM-DDTHH:MM...）直接使用，
+    其他格式（例如 2024/01/01 10:00）解析後轉成 ISO，與趨勢統計的分桶一致；無法解析時為空字串（排在最前面）
+    """
+    if len(value) >= 10 and value[4] == '-' and value[7] == '-' and (len(value) == 10 or value[10] == 'T'):
+        return value
+    moment = parse_timestamp(value)
+    return moment.isoformat() if moment else ''
+
+
+def range_bound_keys(start: Optional[str], end: Optional[str]):
+    """區間頭尾（皆包含）的排序鍵；只給日期時 end 含當天。無法解析時拋出 ValueError"""
+    keys = []
+    for name, value in (('起始', start), ('結束', end)):
+        key = timestamp_sort_key(value) if value else None
+        if value and not key:
+            raise ValueError(f"無法解析的{name}時間：{value}")
+        keys.append(key)
+    if end and len(end) == 10:
+        keys[1] = keys[1][:10] + 'T23:59:59.999999'
+    return keys[0], keys[1]
+
+
+# 沒有時間戳記的匯入列以內容雜湊作為去重鍵，存放在記錄的這個欄位
+CONTENT_HASH_FIELD = 'contentHash'
+
+
+def content_hash_key(value) -> int:
+    """
+    內容雜湊在記錄庫中以 64 位元整數儲存（0 代表沒有雜湊）：取十六進位字串的前 16 位，
+    舊版較長的雜湊也會對應到同一個值；不是十六進位的值則先以 sha1 轉換
+    """
+    text = str(value)
+    try:
+        key = int(text[:16], 16)
+    except ValueError:
+        key = int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:16], 16)
+    return key or 1
+
+# 整數欄以 array('i')（int32）儲存，超出範圍的值無法存入
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+
+class TimeRollupIndex:
+    """
+    依小時／日／週預先彙總的統計，新增記錄時即時累加；
+    查詢趨勢時只需走訪時間區間內的桶，與記錄筆數無關
+    """
+
+    GRANULARITIES = ('hour', 'day', 'week')
+
+    def __init__(self, item_columns: List[str]):
+        self.item_columns = list(item_columns)
+        self.clear()
+
+    def clear(self):
+        # 每個桶存成 [記錄筆數, hack 次數, 各物資數量...]
+        self.buckets = {g: {} for g in self.GRANULARITIES}
+        self.keys = {g: [] for g in self.GRANULARITIES}
+        self.unparsed = 0
+
+    @staticmethod
+    def bucket_key(moment: datetime, granularity: str) -> str:
+        """時間點所屬桶的鍵值（同格式字串可直接排序比較）"""
+        if granularity == 'hour':
+            return moment.strftime('%Y-%m-%dT%H:00')
+        if granularity == 'day':
+            return moment.strftime('%Y-%m-%d')
+        if granularity == 'week':
+            return (moment - timedelta(days=moment.weekday())).strftime('%Y-%m-%d')
+        raise ValueError(f"不支援的時間粒度：{granularity}")
+
+    def add(self, timestamp: str, hack_count: int, values: List[int]):
+        """累加一筆記錄（values 依 item_columns 順序）"""
+        moment = parse_timestamp(timestamp)
+        if moment is None:
+            self.unparsed += 1
+            return
+        for granularity in self.GRANULARITIES:
+            key = self.bucket_key(moment, granularity)
+            bucket = self.buckets[granularity].get(key)
+            if bucket is None:
+                bucket = [0] * (len(self.item_columns) + 2)
+                self.buckets[granularity][key] = bucket
+                insort(self.keys[granularity], key)
+            bucket[0] += 1
+            bucket[1] += hack_count
+            for i, value in enumerate(values):
+                bucket[i + 2] += value
+
+    def state(self) -> Dict:
+        """可序列化的彙總內容（存進快照，載入時不必重新解析每筆時間戳記）"""
+        return {'buckets': self.buckets, 'unparsed': self.unparsed}
+
+    def load_state(self, state: Dict):
+        """還原 state() 的內容"""
+        self.buckets = {g: state['buckets'].get(g, {}) for g in self.GRANULARITIES}
+        self.keys = {g: sorted(self.buckets[g]) for g in self.GRANULARITIES}
+        self.unparsed = state.get('unparsed', 0)
+
+    def query(self, granularity: str = 'day', start: Optional[str] = None,
+              end: Optional[str] = None) -> List[Dict]:
+        """取得時間區間內（含頭尾）各桶的統計"""
+        if granularity not in self.GRANULARITIES:
+            raise ValueError(f"不支援的時間粒度：{granularity}")
+        keys = self.keys[granularity]
+        lo, hi = 0, len(keys)
+        if start:
+            moment = parse_timestamp(start)
+            if moment is None:
+                raise ValueError(f"無法解析的起始時間：{start}")
+            lo = bisect_left(keys, self.bucket_key(moment, granularity))
+        if end:
+            moment = parse_timestamp(end)
+            if moment is None:
+                raise ValueError(f"無法解析的結束時間：{end}")
+            hi = bisect_right(keys, self.bucket_key(moment, granularity))
+        series = []
+        for key in keys[lo:hi]:
+            bucket = self.buckets[granularity][key]
+            items = dict(zip(self.item_columns, bucket[2:]))
+            series.append({
+                'bucket': key,
+                'records': bucket[0],
+                'total_hacks': bucket[1],
+                'total_items': sum(bucket[2:]),
+                'items': items
+            })
+        return series
+
+
+class HackRecordStore:
+    """
+    以欄為單位儲存 hack 記錄：hackCount 與每個物資欄位各一個整數陣列，另有時間戳記欄。
+    對外仍可當作 list of dict 使用（len、索引、迭代、append、extend）。
+    """
+
+    def __init__(self, item_columns: List[str], records: Optional[List[Dict]] = None):
+        self.item_columns = list(item_columns)
+        self.int_columns = ['hackCount'] + self.item_columns
+        self.timestamps = []
+        self.columns = {column: array('i') for column in self.int_columns}
+        # 匯入列的內容雜湊（content_hash_key，0 代表沒有），每列固定 8 bytes
+        self.hashes = array('Q')
+        # 非標準欄位（例如匯入時多出的欄）：列索引 -> {欄位: 值}
+        self.extras = {}
+        # 隨資料異動即時維護的累計值，統計時不必重新掃描
+        self.item_totals = {column: 0 for column in self.item_columns}
+        self.total_hacks = 0
+        self.total_items = 0
+        self.rollups = TimeRollupIndex(self.item_columns)
+        # 依 (時間排序鍵, 列索引) 排序的列索引，供游標分頁與區間查詢使用；亂序匯入時才重建
+        self._order = array('i')
+        self._order_valid = True
+        self._order_last_key = ''
+        # 去重索引：沒有內容雜湊的記錄的時間戳記，以及匯入列的內容雜湊
+        self.timestamp_keys = set()
+        self.content_keys = set()
+        # 資料版本：每次異動都會遞增，供快取判斷資料是否改變
+        self.version = 0
+        # 資料世代：清空或整份重新載入時遞增，依舊內容建立的狀態（例如 GitHub 的 ETag）都要作廢
+        self.generation = 0
+        if records:
+            self.extend(records)
+
+    @staticmethod
+    def _to_int(value, default: int = 0) -> int:
+        if value is None or value == '':
+            return default
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            try:
+                return int(float(value))
+            except (TypeError, ValueError):
+                return default
+
+    def _int_values(self, record: Dict):
+        """取出 hackCount 與各物資欄的整數值；任何一欄超出 int32 範圍時拋出 ValueError"""
+        hack_count = self._to_int(record.get('hackCount', 1), 1)
+        values = [self._to_int(record.get(column, 0)) for column in self.item_columns]
+        for column, value in zip(self.int_columns, [hack_count] + values):
+            if not INT_MIN <= value <= INT_MAX:
+                raise ValueError(f"{column} 的值超出範圍：{value}")
+        return hack_count, values
+
+    def append(self, record: Dict):
+        """新增一筆記錄（數值超出範圍時拋出 ValueError，且不會改動任何欄位）"""
+        # 先檢查完所有欄位再寫入，避免寫到一半失敗留下長度不一致的欄
+        hack_count, values = self._int_values(record)
+        index = len(self.timestamps)
+        self.version += 1
+        timestamp = str(record.get('timestamp', ''))
+        self.timestamps.append(timestamp)
+        content_key = content_hash_key(record[CONTENT_HASH_FIELD]) if CONTENT_HASH_FIELD in record else 0
+        self.hashes.append(content_key)
+        if content_key:
+            self.content_keys.add(content_key)
+        else:
+            self.timestamp_keys.add(timestamp)
+        if self._order_valid:
+            key = timestamp_sort_key(timestamp)
+            if not self._order or self._order_last_key <= key:
+                self._order.append(index)
+                self._order_last_key = key
+            else:
+                self._order_valid = False
+        self.columns['hackCount'].append(hack_count)
+        self.total_hacks += hack_count or 1
+        for column, value in zip(self.item_columns, values):
+            self.columns[column].append(value)
+            self.item_totals[column] += value
+        self.total_items += sum(values)
+        self.rollups.add(timestamp, hack_count or 1, values)
+        extra = {k: v for k, v in record.items()
+                 if k != 'timestamp' and k != CONTENT_HASH_FIELD and k not in self.columns}
+        if extra:
+            self.extras[index] = extra
+
+    def extend(self, records):
+        """新增多筆記錄"""
+        for record in records:
+            self.append(record)
+
+    def load_columns(self, timestamps: List[str], columns: Dict[str, array], extras: Dict[int, Dict],
+                     rollups: Optional[Dict] = None, order: Optional[array] = None,
+                     hashes: Optional[array] = None):
+        """
+        整批載入欄位資料（取代目前內容），供二進位快照使用：
+        整數欄與雜湊欄直接沿用傳入的 array，累計值以向量運算計算；
+        有 rollups／order 時直接還原，不必逐筆解析時間戳記或重新排序。
+        沒有 hashes 時（舊版快照）從 extras 的 contentHash 轉換
+        """
+        self.clear()
+        self.timestamps = timestamps
+        self.columns = {column: columns.get(column, array('i', bytes(4 * len(timestamps))))
+                        for column in self.int_columns}
+        if hashes is None or len(hashes) != len(timestamps):
+            hashes = array('Q', bytes(8 * len(timestamps)))
+            for index in [index for index, extra in extras.items() if CONTENT_HASH_FIELD in extra]:
+                extra = dict(extras[index])
+                hashes[index] = content_hash_key(extra.pop(CONTENT_HASH_FIELD))
+                if extra:
+                    extras[index] = extra
+                else:
+                    del extras[index]
+        self.hashes = hashes
+        self.extras = extras
+        for column in self.item_columns:
+            self.item_totals[column] = self.column_sum(column)
+        self.total_items = sum(self.item_totals.values())
+        self.total_hacks = int(self.effective_hack_counts().sum())
+        self.content_keys = set(hashes)
+        self.content_keys.discard(0)
+        self.timestamp_keys = ({t for t, key in zip(timestamps, hashes) if not key}
+                               if self.content_keys else set(timestamps))
+        if order is not None and len(order) == len(timestamps):
+            self._order = order
+            self._order_last_key = timestamp_sort_key(timestamps[order[-1]]) if len(order) else ''
+        else:
+            self._order_valid = False
+        if rollups is not None:
+            self.rollups.load_state(rollups)
+        else:
+            counts = self.effective_hack_counts()
+            for index, timestamp in enumerate(timestamps):
+                self.rollups.add(timestamp, int(counts[index]),
+                                 [self.columns[column][index] for column in self.item_columns])
+
+    def clear(self):
+        """清空所有記錄"""
+        self.timestamps = []
+        self.columns = {column: array('i') for column in self.int_columns}
+        self.hashes = array('Q')
+        self.extras = {}
+        self.item_totals = {column: 0 for column in self.item_columns}
+        self.total_hacks = 0
+        self.total_items = 0
+        self.rollups.clear()
+        self._order = array('i')
+        self._order_valid = True
+        self._order_last_key = ''
+        self.timestamp_keys = set()
+        self.content_keys = set()
+        self.version += 1
+        self.generation += 1
+
+    def contains(self, record: Dict) -> bool:
+        """
+        記錄是否已存在：沒有內容雜湊的記錄以時間戳記判斷；有雜湊的匯入列以雜湊判斷
+        （只有內容完全相同才算重複），另外也比對沒有雜湊的記錄（例如匯出後再匯入）的時間戳記
+        """
+        if record.get('timestamp') in self.timestamp_keys:
+            return True
+        return CONTENT_HASH_FIELD in record and content_hash_key(record[CONTENT_HASH_FIELD]) in self.content_keys
+
+    def record(self, index: int, fields: Optional[List[str]] = None) -> Dict:
+        """取得單筆記錄（dict 形式），可用 fields 只取部分欄位"""
+        if fields is not None:
+            return {
+                field: self.timestamps[index] if field == 'timestamp' else self.columns[field][index]
+                for field in fields
+            }
+        record = {'timestamp': self.timestamps[index]}
+        for column in self.int_columns:
+            record[column] = self.columns[column][index]
+        if self.hashes[index]:
+            record[CONTENT_HASH_FIELD] = f'{self.hashes[index]:016x}'
+        if index in self.extras:
+            record.update(self.extras[index])
+        return record
+
+    def sorted_indices(self) -> array:
+        """
+        依時間戳記排序（同時間依新增順序）的列索引。
+        重建與使用期間不能有新增（追蹤器中需持有 _write_lock），否則新增的列可能不在索引裡
+        """
+        if not self._order_valid:
+            keys = [timestamp_sort_key(timestamp) for timestamp in self.timestamps]
+            self._order = array('i', sorted(range(len(self)), key=keys.__getitem__))
+            self._order_last_key = keys[self._order[-1]] if keys else ''
+            self._order_valid = True
+        return self._order
+
+    def sort_key(self, index: int) -> str:
+        """某列的時間排序鍵"""
+        return timestamp_sort_key(self.timestamps[index])
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        return self.record(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.record(index)
+
+    def to_list(self) -> List[Dict]:
+        """轉成 list of dict（供 JSON 序列化使用）"""
+        return list(self)
+
+    def _view(self, column: str) -> 'np.ndarray':
+        # 直接共用 array 的記憶體，不複製；陣列被引用期間不能再 append（會拋出 BufferError），
+        # 只供當下計算使用。追蹤器中需持有 _write_lock 才能呼叫，回傳給外部的結果一律是複本
+        import numpy as np
+        data = self.columns[column]
+        if not data:
+            return np.zeros(0, dtype=np.intc)
+        return np.frombuffer(data, dtype=np.intc)
+
+    def column_array(self, column: str) -> 'np.ndarray':
+        """取得某欄的 NumPy 陣列（複本）"""
+        return self._view(column).copy()
+
+    def column_sum(self, column: str) -> int:
+        """重新計算某欄的總和（一般請直接用 item_totals）"""
+        import numpy as np
+        return int(self._view(column).sum(dtype=np.int64))
+
+    def effective_hack_counts(self) -> 'np.ndarray':
+        """每筆記錄的 hack 次數（0 或空值視為 1，與統計邏輯一致）"""
+        import numpy as np
+        counts = self._view('hackCount')
+        return np.where(counts == 0, 1, counts).astype(np.int64)
+
+    def items_per_record(self) -> 'np.ndarray':
+        """每筆記錄的物資總數"""
+        import numpy as np
+        totals = np.zeros(len(self), dtype=np.int64)
+        for column in self.item_columns:
+            totals += self._view(column)
+        return totals
+
+
+def _convert_int(default: int):
+    """產生整數欄位的轉換函式（空值或無法轉換時回傳 default）"""
+    def convert(value: str) -> int:
+        value = value.strip()
+        if not value:
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return int(float(value))
+            except ValueError:
+                return default
+    return convert
+
+
+def _convert_timestamp(value: str) -> str:
+    return value.strip() or datetime.now().isoformat()
+
+
+class CsvRecordParser:
+    """
+    逐步讀取 CSV 並轉成記錄，所有匯入路徑（上傳、本地檔案、GitHub 同步）共用。
+    標題列與欄位別名只解析一次，之後每一欄直接套用預先決定的轉換函式；
+    以 csv 模組解析，引號內的逗號與換行會正確處理
+    """
+
+    HACKCOUNT_ALIASES = ['hackCount', 'Hack次數', 'hack_times', '次數', 'count']
+
+    def __init__(self, item_columns: List[str], item_names: Optional[Dict[str, str]] = None,
+                 batch_size: int = 1000, content_hash: bool = True):
+        self.item_columns = list(item_columns)
+        # 支援以中文物資名稱作為欄位標題
+        self.aliases = {name: column for column, name in (item_names or {}).items()}
+        self.batch_size = batch_size
+        self.content_hash = content_hash
+        self.rows_read = 0
+        # 同一檔案中內容相同的列各自出現的次數，讓重複匯入時雜湊一致
+        self._occurrences = {}
+
+    def _hash_row(self, values: List[str]) -> str:
+        """無時間戳記的列：以欄位內容加上第幾次出現計算雜湊（時間戳記是匯入當下產生的，無法用來去重）"""
+        content = '\x1f'.join(v.strip() for v in values)
+        occurrence = self._occurrences.get(content, 0)
+        self._occurrences[content] = occurrence + 1
+        return hashlib.sha1(f"{content}\x1e{occurrence}".encode('utf-8')).hexdigest()[:16]
+
+    def _hash_record(self, record: Dict) -> str:
+        """
+        有時間戳記的列：以正規化後的時間戳記、hackCount 與各物資欄計算雜湊。
+        同一時間（例如只記到分鐘）內容不同的列各自保留，完全相同的列才視為重複；
+        與欄位順序、別名無關，匯出後再匯入也會得到相同的雜湊
+        """
+        values = [record['timestamp'], record.get('hackCount', 1)] + [record.get(c, 0) for c in self.item_columns]
+        content = '\x1f'.join(str(value) for value in values)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()[:16]
+
+    def _compile(self, headers: List[str]):
+        """依標題決定每一欄的 (索引, 欄位名稱, 轉換函式)"""
+        headers = [h.strip().lstrip('\ufeff') for h in headers]
+        hackcount_header = next((a for a in self.HACKCOUNT_ALIASES if a in headers), None)
+        converters = []
+        for i, header in enumerate(headers):
+            if header == 'timestamp':
+                converters.append((i, header, _convert_timestamp))
+            elif header == hackcount_header:
+                converters.append((i, 'hackCount', _convert_int(1)))
+            elif header in self.HACKCOUNT_ALIASES:
+                continue
+            else:
+                converters.append((i, self.aliases.get(header, header), _convert_int(0)))
+        timestamp_index = headers.index('timestamp') if 'timestamp' in headers else None
+        # 缺少的欄位以預設值補上
+        defaults = []
+        if 'timestamp' not in headers:
+            defaults.append(('timestamp', lambda: datetime.now().isoformat()))
+        if hackcount_header is None:
+            defaults.append(('hackCount', lambda: 1))
+        return len(headers), converters, defaults, timestamp_index
+
+    def iter_batches(self, text_stream):
+        """從文字串流逐批產生記錄（list of dict）"""
+        reader = csv.reader(text_stream)
+        headers = next(reader, None)
+        if not headers:
+            return
+        width, converters, defaults, timestamp_index = self._compile(headers)
+        batch = []
+        for values in reader:
+            if len(values) != width:
+                # 空行或欄位數不符的列直接略過
+                continue
+            self.rows_read += 1
+            record = {key: convert(values[i]) for i, key, convert in converters}
+            for key, default in defaults:
+                record[key] = default()
+            if self.content_hash:
+                if timestamp_index is None or not values[timestamp_index].strip():
+                    record[CONTENT_HASH_FIELD] = self._hash_row(values)
+                else:
+                    record[CONTENT_HASH_FIELD] = self._hash_record(record)
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+# 上傳 CSV 的編碼依序嘗試（utf-8-sig 同時處理有無 BOM；cp950 是 big5 的超集）
+CSV_ENCODINGS = ('utf-8-sig', 'cp950', 'big5')
+# 只取開頭這麼多 bytes 判斷編碼
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+def detect_encoding(sample: bytes) -> Optional[str]:
+    """以檔案開頭的樣本判斷編碼，無法辨識時回傳 None"""
+    for encoding in CSV_ENCODINGS:
+        # 樣本可能在多位元組字元中間截斷，用增量解碼器（final=False）才不會誤判
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+class _StreamReader(io.RawIOBase):
+    """以 read() 讀取呼叫端的二進位串流（不需要串流實作 readinto；關閉時不會連同原串流一起關閉）"""
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class _TeeTextReader:
+    """逐行讀取文字串流時，順便把讀到的內容寫到另一個檔案"""
+
+    def __init__(self, stream, sink):
+        self._stream = stream
+        self._sink = sink
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = next(self._stream)
+        self._sink.write(line)
+        return line
+
 
 class IngressHackTracker:
+    @timed('tracker_operation_duration_seconds', operation='plot_item_ratio_per_hack')
     def plot_item_ratio_per_hack(self, save_path: str = "static/item_ratio_per_hack.png"):
         """
         繪製各物資在每次 hack 中的比例圖（圓餅圖）
@@ -27,26 +641,15 @@ class IngressHackTracker:
         if not self.hack_data:
             print("⚠️ 沒有資料可以繪圖！")
             return
-        # 計算所有物資的總獲得量
-        total_items = sum(
-            sum(record.get(column, 0) for column in self.item_columns)
-            for record in self.hack_data
-        )
-        # 計算各物資的總獲得量
-        item_totals = {col: sum(record.get(col, 0) for record in self.hack_data) for col in self.item_columns}
-        # 計算各物資在所有 hack 中的比例
-        labels = [self.item_names.get(col, col) for col in self.item_columns if item_totals[col] > 0]
-        sizes = [item_totals[col] / total_items * 100 for col in self.item_columns if item_totals[col] > 0]
-        # 畫圓餅圖
-        plt.figure(figsize=(10, 8))
-        plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
-        plt.title('各物資在所有 Hack 中的比例')
-        plt.axis('equal')
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(10, 8))
+        self._draw_item_ratio(ax)
         plt.tight_layout()
         plt.savefig(save_path, dpi=300, bbox_inches='tight')
         print(f"📊 物資比例圖已儲存為 {save_path}")
         plt.show()
 
+    @timed('tracker_operation_duration_seconds', operation='plot_total_items_per_hack')
     def plot_total_items_per_hack(self, save_path: str = "static/total_items_per_hack.png"):
         """
         繪製每次 hack 拿到物資總數的分布圖（直方圖）
@@ -54,58 +657,191 @@ class IngressHackTracker:
         if not self.hack_data:
             print("⚠️ 沒有資料可以繪圖！")
             return
-        # 計算每次 hack 拿到的物資總數
-        total_items_per_hack = [
-            sum(record.get(col, 0) for col in self.item_columns) / int(record.get('hackCount', 1) or 1)
-            for record in self.hack_data if int(record.get('hackCount', 1) or 1) > 0
-        ]
-        plt.figure(figsize=(10, 6))
-        plt.hist(total_items_per_hack, bins=15, color='skyblue', edgecolor='navy', alpha=0.7)
-        plt.xlabel('每次 Hack 拿到的物資數量')
-        plt.ylabel('次數')
-        plt.title('每次 Hack 拿到物資數量的分布')
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(10, 6))
+        self._draw_items_distribution(ax)
         plt.tight_layout()
         plt.savefig(save_path, dpi=300, bbox_inches='tight')
         print(f"📊 每次 Hack 物資分布圖已儲存為 {save_path}")
         plt.show()
-    def load_from_csv(self, file_stream) -> int:
-        """
-        從檔案流匯入 CSV 資料，回傳成功匯入的筆數，並自動轉換成 UTF-8
-        """
-        import io
-        content = None
-        if hasattr(file_stream, 'read'):
-            raw = file_stream.read()
-            # 嘗試多種編碼
-            for encoding in ['utf-8-sig', 'utf-8', 'big5', 'cp950']:
-                try:
-                    content = raw.decode(encoding)
-                    # 若不是 utf-8，則自動轉存 utf-8
-                    if encoding not in ['utf-8', 'utf-8-sig']:
-                        # 重新以 utf-8 儲存一份
-                        with open('last_uploaded_utf8.csv', 'w', encoding='utf-8') as f:
-                            f.write(content)
-                    break
-                except Exception:
-                    continue
-            if content is None:
-                raise ValueError("CSV 檔案編碼無法辨識，請另存為 UTF-8 再上傳")
+
+    def _draw_item_ratio(self, ax):
+        """在 ax 上畫各物資比例圓餅圖"""
+        # 各物資與所有物資的總獲得量（隨資料異動即時維護）
+        item_totals = self.hack_data.item_totals
+        total_items = self.hack_data.total_items
+        # 計算各物資在所有 hack 中的比例
+        labels = [self.item_names.get(col, col) for col in self.item_columns if item_totals[col] > 0]
+        sizes = [item_totals[col] / total_items * 100 for col in self.item_columns if item_totals[col] > 0]
+        ax.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=140)
+        ax.set_title('各物資在所有 Hack 中的比例')
+        ax.axis('equal')
+
+    def _draw_items_distribution(self, ax):
+        """在 ax 上畫每次 hack 物資總數的直方圖"""
+        # 計算每次 hack 拿到的物資總數（讀取欄位期間不能有新資料寫入）
+        with self._write_lock:
+            hack_counts = self.hack_data.effective_hack_counts()
+            valid = hack_counts > 0
+            total_items_per_hack = self.hack_data.items_per_record()[valid] / hack_counts[valid]
+        ax.hist(total_items_per_hack, bins=15, color='skyblue', edgecolor='navy', alpha=0.7)
+        ax.set_xlabel('每次 Hack 拿到的物資數量')
+        ax.set_ylabel('次數')
+        ax.set_title('每次 Hack 拿到物資數量的分布')
+
+    def _draw_item_chart(self, ax):
+        """在 ax 上畫各物資總量長條圖"""
+        items = [self.item_names.get(col, col) for col in self.item_columns if self.hack_data.item_totals[col] > 0]
+        values = [self.hack_data.item_totals[col] for col in self.item_columns if self.hack_data.item_totals[col] > 0]
+        
+        bars = ax.bar(items, values, color='skyblue', edgecolor='navy', alpha=0.7)
+        
+        # 在每個柱子上顯示數值
+        for bar, value in zip(bars, values):
+            height = bar.get_height()
+            ax.text(bar.get_x() + bar.get_width()/2., height + 0.5,
+                   f'{value}', ha='center', va='bottom')
+        
+        ax.set_title('Ingress Portal Hack 物資獲得統計', fontsize=16, fontweight='bold')
+        ax.set_xlabel('物資類型', fontsize=12)
+        ax.set_ylabel('獲得數量', fontsize=12)
+        
+        # 旋轉 x 軸標籤以避免重疊
+        ax.tick_params(axis='x', labelrotation=45)
+        for label in ax.get_xticklabels():
+            label.set_horizontalalignment('right')
+
+    @timed('tracker_operation_duration_seconds', operation='render_chart')
+    def render_chart(self, kind: str, width: int = 800, height: int = 600, dpi: int = 100) -> bytes:
+        """
+        在伺服器端把圖表畫成 PNG，回傳圖檔內容
+        kind：items / ratio / distribution；width、height 為像素
+        結果以 (種類, 資料版本, 尺寸, dpi) 快取，資料沒變動時直接回傳快取
+        """
+        if kind not in CHART_KINDS:
+            raise ValueError(f"不支援的圖表種類：{kind}")
+        if not self.hack_data or self.hack_data.total_items == 0:
+            raise ValueError("沒有資料可以繪圖！")
+        key = (kind, self.hack_data.version, width, height, dpi)
+        with self._chart_lock:
+            png = self._chart_cache.get(key)
+            if png is not None:
+                self._chart_cache.move_to_end(key)
+                return png
+
+        # 不經過 pyplot，直接用 Agg 畫布，不需要顯示器也不會共用全域狀態
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        import matplotlib
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft JhengHei', 'SimHei', 'DejaVu Sans']
+        matplotlib.rcParams['axes.unicode_minus'] = False
+
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        FigureCanvasAgg(fig)
+        getattr(self, CHART_KINDS[kind])(fig.add_subplot())
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=dpi)
+        png = buffer.getvalue()
+
+        with self._chart_lock:
+            self._chart_cache[key] = png
+            self._chart_cache.move_to_end(key)
+            while len(self._chart_cache) > CHART_CACHE_SIZE:
+                self._chart_cache.popitem(last=False)
+        return png
+    @timed('tracker_operation_duration_seconds', operation='load_from_csv')
+    def load_from_csv(self, file_stream, utf8_copy_path: Optional[str] = None) -> int:
+        """
+        從二進位檔案流（或檔案路徑）匯入 CSV 資料，回傳成功匯入的筆數
+        先以開頭樣本判斷編碼（UTF-8 / Big5），之後邊解碼邊解析；
+        樣本之後才出現無法解碼的內容時，從頭改用下一個候選編碼重新解析（解析完整成功才寫入資料）
+        utf8_copy_path：非 UTF-8 的檔案要另存一份 UTF-8 副本時指定路徑（解析時順便寫入）
+        """
+        if isinstance(file_stream, (str, os.PathLike)):
+            with open(file_stream, 'rb') as f:
+                return self.load_from_csv(f, utf8_copy_path)
+        
+        if not getattr(file_stream, 'seekable', lambda: False)():
+            # 換編碼重試需要從頭再讀一次，不能 seek 的串流先暫存（小檔案留在記憶體）
+            import shutil
+            import tempfile
+            spooled = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+            shutil.copyfileobj(file_stream, spooled)
+            spooled.seek(0)
+            with spooled:
+                return self.load_from_csv(spooled, utf8_copy_path)
+        
+        start = file_stream.tell()
+        encoding = detect_encoding(file_stream.read(ENCODING_SAMPLE_SIZE))
+        if encoding is None:
+            raise ValueError("CSV 檔案編碼無法辨識，請另存為 UTF-8 再上傳")
+        
+        def open_text(encoding):
+            file_stream.seek(start)
+            return io.TextIOWrapper(io.BufferedReader(_StreamReader(file_stream)), encoding=encoding, newline='')
+        
+        # 先完整檢查一遍（順便寫出 UTF-8 副本），確定能解碼且數值都在範圍內後才從頭逐批匯入
+        for encoding in CSV_ENCODINGS[CSV_ENCODINGS.index(encoding):]:
+            text_stream = open_text(encoding)
+            copy_file = None
+            if utf8_copy_path and encoding != 'utf-8-sig':
+                copy_file = open(utf8_copy_path, 'w', encoding='utf-8', newline='')
+                text_stream = _TeeTextReader(text_stream, copy_file)
+            try:
+                rows = self.check_csv_stream(text_stream)
+                break
+            except UnicodeDecodeError:
+                # 樣本之後才出現無法解碼的位元組；還沒寫入任何資料，換下一個編碼
+                print(f"⚠️ CSV 檔案無法以 {encoding} 完整解碼，改用其他編碼重試")
+            finally:
+                if copy_file:
+                    copy_file.close()
         else:
-            content = str(file_stream)
-        return self.load_from_csv_content(content)
-    def __init__(self, data_file: str = "ingress_hack_data.json"):
-        """初始化追蹤器"""
+            raise ValueError("CSV 檔案含有無法解碼的內容，請另存為 UTF-8 再上傳")
+        if not rows:
+            raise ValueError("CSV 檔案格式不正確！")
+        added, _ = self.ingest_csv_stream(open_text(encoding), checked=True)
+        return added
+    def __init__(self, data_file: str = "ingress_hack_data.json", content_dedup: bool = True,
+                 storage: Optional[str] = None, config_file: str = "github_config.json",
+                 write_behind: Optional[bool] = None):
+        """
+        初始化追蹤器
+        storage：資料儲存後端（binary / json / sqlite），未指定時讀取環境變數 INGRESS_STORAGE
+        config_file：GitHub 設定檔路徑（每位使用者各自一份時指定到使用者的資料夾）
+        write_behind：是否延後合併寫入，未指定時讀取環境變數 INGRESS_WRITE_BEHIND
+        """
         self.data_file = data_file
-        self.hack_data = []
+        self.config_file = config_file
+        if write_behind is None:
+            write_behind = os.environ.get('INGRESS_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+        self.write_behind = write_behind
+        # 所有改動 hack_data 與呼叫儲存後端的動作都在這個鎖內進行；
+        # 唯一的例外是背景寫入執行緒在鎖外寫入已取走的一批記錄（見 _flush_loop）
+        self._write_lock = threading.RLock()
+        self._flush_wakeup = threading.Condition(self._write_lock)
+        # 已加入 hack_data、尚未寫入儲存後端的記錄（依新增順序）
+        self._pending = []
+        # 背景寫入執行緒正在鎖外寫入的筆數；不為 0 時其他呼叫儲存後端的動作要先等它寫完
+        self._writing = 0
+        self._flusher = None
+        # 匯入 CSV 時是否以內容雜湊去重（關閉時只比對時間戳記，同一時間的列只會保留一筆）
+        self.content_dedup = content_dedup
         self.authenticated = False
         self.current_user = None
         self.github_config = {}
+        self._github_client = None
+        self._github_client_key = None
+        # 分區上傳用：尚未上傳的月份（None 表示不確定，上傳時逐一比對 SHA），
+        # 以及上次同步／上傳時各分區的 SHA
+        self._dirty_partitions = None
+        self._partition_shas = {}
+        self._partition_cache = (None, {})
+        # 上述 SHA 與 GitHub 連線的 ETag 快取所對應的資料世代
+        self._github_generation = None
         
-        # 預設帳號密碼 (實際使用時請修改)
-        self.valid_credentials = {
-            'tulacu': '611450',
-            'winnietest': 'winnie123'
-        }
+        self.valid_credentials = dict(VALID_CREDENTIALS)
         
         # 物資欄位名稱
         self.item_columns = [
@@ -135,6 +871,16 @@ class IngressHackTracker:
             'Virus': '病毒'
         }
         
+        # 以欄式儲存的記錄，用法與 list of dict 相同
+        self.hack_data = HackRecordStore(self.item_columns)
+        self.storage = create_storage(storage, data_file, self.item_columns)
+        # 圖表渲染快取：(種類, 資料版本, 寬, 高, dpi) → PNG，超過上限時淘汰最久沒用的
+        self._chart_cache = OrderedDict()
+        self._chart_lock = threading.Lock()
+        # 掉落率分析結果快取：(資料版本, 參數...) → 結果，bootstrap 每次資料變動只算一次
+        self._analytics_cache = OrderedDict()
+        self._analytics_lock = threading.Lock()
+        
         self.load_data()
         self.load_github_config()
         
@@ -162,8 +908,12 @@ class IngressHackTracker:
             return False
         return True
     
-    def save_github_config(self, repo: str, token: str, filename: str = "ingress_hack_data.csv"):
-        """儲存 GitHub 設定"""
+    def save_github_config(self, repo: str, token: str, filename: str = "ingress_hack_data.csv",
+                           api_url: Optional[str] = None, layout: str = "single"):
+        """
+        儲存 GitHub 設定（api_url 可指定 GitHub Enterprise 或本機測試伺服器）
+        layout：single 為單一 CSV；monthly 為每月一個 CSV 加上 manifest.json，只上傳有變動的月份
+        """
         if not self.check_auth():
             return
             
@@ -172,8 +922,12 @@ class IngressHackTracker:
             'token': token,
             'filename': filename
         }
+        if api_url:
+            self.github_config['api_url'] = api_url
+        if layout == 'monthly':
+            self.github_config['layout'] = layout
         
-        with open('github_config.json', 'w', encoding='utf-8') as f:
+        with open(self.config_file, 'w', encoding='utf-8') as f:
             json.dump(self.github_config, f, ensure_ascii=False, indent=2)
         
         print("💾 GitHub 設定已儲存！")
@@ -181,12 +935,13 @@ class IngressHackTracker:
     def load_github_config(self):
         """載入 GitHub 設定"""
         try:
-            if os.path.exists('github_config.json'):
-                with open('github_config.json', 'r', encoding='utf-8') as f:
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
                     self.github_config = json.load(f)
         except Exception as e:
             print(f"⚠️ 載入 GitHub 設定失敗：{e}")
     
+    @timed('tracker_operation_duration_seconds', operation='sync_from_github')
     def sync_from_github(self) -> bool:
         """從 GitHub 同步資料"""
         if not self.check_auth():
@@ -199,64 +954,31 @@ class IngressHackTracker:
         try:
             print("🔄 正在從 GitHub 同步資料...")
             
-            repo = self.github_config['repo']
-            token = self.github_config['token']
-            filename = self.github_config['filename']
-            
-            headers = {
-                'Authorization': f'token {token}',
-                'Accept': 'application/vnd.github.v3+json'
-            }
-            
-            response = requests.get(
-                f'https://api.github.com/repos/{repo}/contents/{filename}',
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                file_data = response.json()
-                csv_content = base64.b64decode(file_data['content']).decode('utf-8')
-                
-                # 解析 CSV
-                lines = csv_content.strip().split('\n')
-                if len(lines) > 1:
-                    headers_list = [h.strip() for h in lines[0].split(',')]
-                    github_data = []
-                    
-                    for line in lines[1:]:
-                        if line.strip():
-                            values = line.split(',')
-                            record = {}
-                            for i, header in enumerate(headers_list):
-                                if header == 'timestamp':
-                                    record[header] = values[i].strip()
-                                else:
-                                    record[header] = int(values[i]) if values[i].strip() else 0
-                            github_data.append(record)
-                    
-                    # 合併資料（避免重複）
-                    existing_timestamps = {r['timestamp'] for r in self.hack_data}
-                    new_records = [r for r in github_data if r['timestamp'] not in existing_timestamps]
-                    
-                    self.hack_data.extend(new_records)
-                    self.save_data()
-                    
-                    print(f"✅ 成功從 GitHub 同步資料！新增了 {len(new_records)} 筆記錄。")
-                    return True
-                else:
-                    print("⚠️ GitHub 上沒有找到資料檔案。")
-                    return False
-            elif response.status_code == 404:
+            client = self.github_client()
+            self._forget_synced_state(client)
+            if self.github_config.get('layout') == 'monthly':
+                return self._sync_partitions(client)
+            content = client.get_file(self.github_config['filename'])
+            if content is client.NOT_MODIFIED:
+                print("✅ GitHub 上的資料沒有變動，不需要同步。")
+                return True
+            if content is None:
                 print("⚠️ GitHub 上沒有找到資料檔案。")
                 return False
+            
+            added, rows = self.ingest_csv_stream(io.StringIO(content.decode('utf-8-sig'), newline=''))
+            if rows:
+                print(f"✅ 成功從 GitHub 同步資料！新增了 {added} 筆記錄。")
+                return True
             else:
-                print(f"❌ 同步失敗：HTTP {response.status_code}")
+                print("⚠️ GitHub 上沒有找到資料檔案。")
                 return False
                 
         except Exception as e:
             print(f"❌ 從 GitHub 同步資料失敗：{e}")
             return False
     
+    @timed('tracker_operation_duration_seconds', operation='upload_to_github')
     def upload_to_github(self) -> bool:
         """上傳資料到 GitHub"""
         if not self.check_auth():
@@ -273,58 +995,157 @@ class IngressHackTracker:
         try:
             print("☁️ 正在上傳資料到 GitHub...")
             
-            repo = self.github_config['repo']
-            token = self.github_config['token']
-            filename = self.github_config['filename']
+            if self.github_config.get('layout') == 'monthly':
+                client = self.github_client()
+                self._forget_synced_state(client)
+                return self._upload_partitions(client)
             
             # 生成 CSV 內容
             csv_content = self.generate_csv_content()
-            encoded_content = base64.b64encode(csv_content.encode('utf-8')).decode('utf-8')
-            
-            headers = {
-                'Authorization': f'token {token}',
-                'Accept': 'application/vnd.github.v3+json',
-                'Content-Type': 'application/json'
-            }
-            
-            # 檢查檔案是否存在
-            sha = None
-            check_response = requests.get(
-                f'https://api.github.com/repos/{repo}/contents/{filename}',
-                headers=headers
-            )
-            
-            if check_response.status_code == 200:
-                sha = check_response.json()['sha']
-            
-            # 上傳檔案
-            upload_data = {
-                'message': f'更新 Ingress hack 資料 - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}',
-                'content': encoded_content
-            }
-            
-            if sha:
-                upload_data['sha'] = sha
-            
-            upload_response = requests.put(
-                f'https://api.github.com/repos/{repo}/contents/{filename}',
-                headers=headers,
-                json=upload_data
+            uploaded = self.github_client().put_file(
+                self.github_config['filename'],
+                csv_content.encode('utf-8'),
+                f'更新 Ingress hack 資料 - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
             )
             
-            if upload_response.status_code in [200, 201]:
+            if uploaded:
                 print("✅ 資料成功上傳到 GitHub！")
-                return True
             else:
-                print(f"❌ 上傳失敗：HTTP {upload_response.status_code}")
-                return False
+                print("✅ GitHub 上的資料已是最新，不需要上傳。")
+            return True
                 
         except Exception as e:
             print(f"❌ 上傳到 GitHub 失敗：{e}")
             return False
     
+    def _partition_paths(self):
+        """分區檔案所在目錄與 manifest 路徑（檔名去掉 .csv 當目錄名稱）"""
+        base = self.github_config['filename']
+        if base.lower().endswith('.csv'):
+            base = base[:-4]
+        return base, f'{base}/{MANIFEST_NAME}'
+    
+    def _partition_indices(self) -> Dict[str, List[int]]:
+        """各月份分區的記錄索引（依新增順序），資料沒變動時使用快取"""
+        version, partitions = self._partition_cache
+        if version != self.hack_data.version:
+            partitions = {}
+            for index, timestamp in enumerate(self.hack_data.timestamps):
+                partitions.setdefault(partition_key(timestamp), []).append(index)
+            self._partition_cache = (self.hack_data.version, partitions)
+        return partitions
+    
+    def _sync_partitions(self, client) -> bool:
+        """分區同步：讀 manifest，只下載 SHA 與上次不同的月份"""
+        base, manifest_path = self._partition_paths()
+        manifest = client.get_file(manifest_path)
+        if manifest is client.NOT_MODIFIED:
+            print("✅ GitHub 上的資料沒有變動，不需要同步。")
+            return True
+        if manifest is None:
+            print("⚠️ GitHub 上沒有找到分區 manifest。")
+            return False
+        
+        partitions = json.loads(manifest.decode('utf-8')).get('partitions', {})
+        added = fetched = 0
+        for name, info in sorted(partitions.items()):
+            if self._partition_shas.get(name) == info['sha']:
+                continue
+            content = client.get_file(f"{base}/{info['path']}", conditional=False)
+            if content is None:
+                print(f"⚠️ 找不到分區檔案：{info['path']}")
+                continue
+            count, _ = self.ingest_csv_stream(io.StringIO(content.decode('utf-8-sig'), newline=''))
+            added += count
+            fetched += 1
+            self._partition_shas[name] = info['sha']
+        print(f"✅ 成功從 GitHub 同步資料！下載 {fetched}/{len(partitions)} 個分區，新增了 {added} 筆記錄。")
+        return True
+    
+    def _upload_partitions(self, client) -> bool:
+        """分區上傳：只上傳有變動的月份，最後更新 manifest"""
+        from github_client import git_blob_sha
+        base, manifest_path = self._partition_paths()
+        headers = ['timestamp', 'hackCount'] + self.item_columns
+        message = f'更新 Ingress hack 資料 - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        
+        # 在鎖內取出並清空待上傳的月份、產生內容；上傳期間新變動的月份會留到下次上傳
+        with self._write_lock:
+            dirty = self._dirty_partitions
+            self._dirty_partitions = set()
+            local = self._partition_indices()
+            candidates = local.keys() if dirty is None else dirty & local.keys()
+            contents = {name: ('\n'.join(self.iter_csv_lines(indices=local[name])).encode('utf-8'), len(local[name]))
+                        for name in candidates}
+        
+        try:
+            manifest = client.get_file(manifest_path, conditional=False)
+            partitions = json.loads(manifest.decode('utf-8')).get('partitions', {}) if manifest else {}
+            uploaded = 0
+            for name, (content, records) in sorted(contents.items()):
+                info = partitions.get(name, {'path': f'{name}.csv', 'sha': ''})
+                if git_blob_sha(content) == info['sha']:
+                    continue
+                client.put_file(f"{base}/{info['path']}", content, message, sha=info['sha'])
+                partitions[name] = {
+                    'path': info['path'],
+                    'sha': client.cache[f"{base}/{info['path']}"]['sha'],
+                    'records': records
+                }
+                self._partition_shas[name] = partitions[name]['sha']
+                uploaded += 1
+            
+            if uploaded or manifest is None:
+                manifest_content = json.dumps({
+                    'layout': 'monthly',
+                    'columns': headers,
+                    'partitions': dict(sorted(partitions.items())),
+                    'updated_at': datetime.now().isoformat()
+                }, ensure_ascii=False, indent=2).encode('utf-8')
+                client.put_file(manifest_path, manifest_content, message)
+        except Exception:
+            # 上傳失敗：這次取出的月份放回待上傳（已上傳的分區下次比對 SHA 後不會重傳內容）
+            with self._write_lock:
+                if dirty is None:
+                    self._dirty_partitions = None
+                elif self._dirty_partitions is not None:
+                    self._dirty_partitions |= dirty
+            raise
+        
+        if uploaded:
+            print(f"✅ 資料成功上傳到 GitHub！更新了 {uploaded} 個分區。")
+        else:
+            print("✅ GitHub 上的資料已是最新，不需要上傳。")
+        return True
+    
+    def _forget_synced_state(self, client):
+        """
+        資料被清空或整份重新載入（資料世代改變）後，之前同步時記下的 ETag 與分區 SHA
+        不再代表本地內容，全部作廢，下次同步才會重新下載；遠端檔案的 SHA 仍然有效，上傳時沿用
+        """
+        with self._write_lock:
+            generation = self.hack_data.generation
+            if generation == self._github_generation:
+                return
+            self._github_generation = generation
+            self._partition_shas = {}
+        for cached in client.cache.values():
+            cached['etag'] = ''
+    
+    def github_client(self):
+        """
+        取得 GitHub 連線（同一組 repo／token 會重複使用，保留連線與 ETag／SHA 快取）
+        github_config 可加上 api_url 指定 API 位址
+        """
+        from github_client import GitHubClient
+        key = (self.github_config['repo'], self.github_config['token'], self.github_config.get('api_url'))
+        if self._github_client is None or self._github_client_key != key:
+            self._github_client = GitHubClient(key[0], key[1], api_url=key[2])
+            self._github_client_key = key
+        return self._github_client
+    
     def add_hack_data(self, hack_count: int = 1, **items) -> bool:
-        """新增 Hack 數據"""
+        """新增 Hack 數據（數值超出欄位範圍時拋出 ValueError，資料不變）"""
         if not self.check_auth():
             return False
         
@@ -337,15 +1158,84 @@ class IngressHackTracker:
         for column in self.item_columns:
             new_record[column] = items.get(column, 0)
         
-        self.hack_data.append(new_record)
-        self.save_data()
+        with self._write_lock:
+            self.hack_data.append(new_record)
+            self.append_records([new_record])
         
         print("✅ 資料已新增！")
         return True
     
+    def _validate_record(self, record) -> Dict:
+        """檢查並正規化一筆外部傳入的記錄，格式錯誤時拋出 ValueError"""
+        if not isinstance(record, dict):
+            raise ValueError("記錄必須是物件")
+        unknown = [key for key in record if key not in ('timestamp', 'hackCount') and key not in self.item_columns]
+        if unknown:
+            raise ValueError(f"未知的欄位：{', '.join(unknown)}")
+        timestamp = record.get('timestamp')
+        if timestamp is not None and (not isinstance(timestamp, str) or parse_timestamp(timestamp) is None):
+            raise ValueError(f"無效的時間戳記：{timestamp}")
+        normalized = {'timestamp': timestamp or datetime.now().isoformat()}
+        for column in ['hackCount'] + self.item_columns:
+            value = record.get(column, 1 if column == 'hackCount' else 0)
+            if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+                raise ValueError(f"{column} 必須是非負整數")
+            if value > INT_MAX:
+                raise ValueError(f"{column} 不能超過 {INT_MAX}")
+            normalized[column] = value
+        return normalized
+    
+    def add_hack_data_many(self, records: List[Dict]) -> int:
+        """
+        批次新增 Hack 數據：全部驗證通過才寫入，並以一次寫入（含 fsync）持久化。
+        已存在相同時間戳記的記錄會略過，方便離線資料重送。回傳實際新增筆數
+        """
+        if not self.check_auth():
+            return 0
+        
+        normalized = []
+        for i, record in enumerate(records):
+            try:
+                normalized.append(self._validate_record(record))
+            except ValueError as e:
+                raise ValueError(f"第 {i + 1} 筆資料錯誤：{e}")
+        
+        new_records = []
+        with self._write_lock:
+            for record in normalized:
+                if not self.hack_data.contains(record):
+                    self.hack_data.append(record)
+                    new_records.append(record)
+            self.append_records(new_records, sync=True)
+        
+        print(f"✅ 已批次新增 {len(new_records)} 筆資料！")
+        return len(new_records)
+    
+    @property
+    def data_version(self) -> int:
+        """資料版本：每次新增、清空或重新載入都會遞增，可用來判斷快取是否過期"""
+        return self.hack_data.version
+
+    def get_totals(self) -> Dict:
+        """
+        取得累計值（記錄數、hack 次數、各物資總量）。
+        SQLite 後端直接由資料庫彙總，包含其他 worker 的寫入；否則使用記憶體中的累計值
+        """
+        # 還有延後寫入的記錄時，資料庫的彙總不完整，改用記憶體中的累計值
+        totals = None if self.pending_count() else self.storage.totals()
+        if totals is None:
+            totals = {
+                'total_records': len(self.hack_data),
+                'total_hacks': self.hack_data.total_hacks,
+                'total_items': self.hack_data.total_items,
+                'item_totals': dict(self.hack_data.item_totals)
+            }
+        return totals
+    
     def get_stats(self) -> Dict:
         """取得統計資料"""
-        if not self.hack_data:
+        totals = self.get_totals()
+        if not totals['total_records']:
             return {
                 'total_hacks': 0,
                 'total_items': 0,
@@ -353,16 +1243,10 @@ class IngressHackTracker:
                 'total_records': 0
             }
         
-        total_hacks = sum(
-            int(record.get('hackCount', 1) or 1)
-            for record in self.hack_data
-        )
-        total_items = sum(
-            sum(record.get(column, 0) for column in self.item_columns)
-            for record in self.hack_data
-        )
+        total_hacks = totals['total_hacks']
+        total_items = totals['total_items']
         avg_items_per_hack = total_items / total_hacks if total_hacks > 0 else 0.0
-        total_records = len(self.hack_data)
+        total_records = totals['total_records']
         
         return {
             'total_hacks': total_hacks,
@@ -384,15 +1268,211 @@ class IngressHackTracker:
         print(f"總記錄筆數: {stats['total_records']}")
         print("="*50)
     
+    def get_item_stats(self) -> Dict:
+        """
+        取得各物資的總獲得量、佔總物資比例與平均每次 Hack 獲得量；
+        直接讀取累計值，一次算完所有欄位，不需掃描記錄
+        """
+        totals = self.get_totals()
+        total_hacks = totals['total_hacks']
+        total_items = totals['total_items']
+        items = []
+        for column in self.item_columns:
+            total = totals['item_totals'][column]
+            percentage = (total / total_items * 100) if total_items > 0 else 0.0
+            avg_per_hack = total / total_hacks if total_hacks > 0 else 0.0
+            items.append({
+                'column': column,
+                'name': self.item_names.get(column, column),
+                'total': total,
+                'percentage': round(percentage, 2),
+                'avg_per_hack': round(avg_per_hack, 2)
+            })
+        return {
+            'total_hacks': total_hacks,
+            'total_items': total_items,
+            'items': items
+        }
+    
+    def _cached_analysis(self, key: tuple, compute):
+        """以 (資料版本, key) 快取分析結果，超過上限時淘汰最久沒用的"""
+        key = (self.data_version,) + key
+        with self._analytics_lock:
+            if key in self._analytics_cache:
+                self._analytics_cache.move_to_end(key)
+                return self._analytics_cache[key]
+        result = compute()
+        with self._analytics_lock:
+            self._analytics_cache[key] = result
+            while len(self._analytics_cache) > ANALYTICS_CACHE_SIZE:
+                self._analytics_cache.popitem(last=False)
+        return result
+
+    def _analysis_arrays(self, start: Optional[str] = None, end: Optional[str] = None):
+        """
+        期間內每筆記錄的 hack 次數與各物資欄（複本，計算期間有新資料寫入也不受影響）
+        """
+        import numpy as np
+        store = self.hack_data
+        # 讀取欄位與排序索引期間不能有新資料寫入；取出的都是複本，之後的計算不需要鎖
+        with self._write_lock:
+            if start is None and end is None:
+                return store.effective_hack_counts(), [store.column_array(c) for c in self.item_columns]
+            indices = np.array(self._range_indices(start, end), dtype=np.intp)
+            return (store.effective_hack_counts()[indices],
+                    [store._view(column)[indices] for column in self.item_columns])
+
+    @timed('tracker_operation_duration_seconds', operation='get_drop_rates')
+    def get_drop_rates(self, method: str = 'poisson', confidence: float = 0.95,
+                       start: Optional[str] = None, end: Optional[str] = None) -> Dict:
+        """
+        各物資每次 Hack 的掉落率與信賴區間（method：poisson / normal / bootstrap）
+        可用 start / end 限定期間；結果依資料版本快取
+        """
+        from drop_rates import drop_rates, to_number
+
+        def compute():
+            hacks, columns = self._analysis_arrays(start, end)
+            result = drop_rates(hacks, columns, method, confidence)
+            items = []
+            for j, column in enumerate(self.item_columns):
+                items.append({
+                    'column': column,
+                    'name': self.item_names.get(column, column),
+                    'total': int(result['totals'][j]),
+                    'rate': to_number(result['rates'][j]),
+                    'lower': to_number(result['lower'][j]),
+                    'upper': to_number(result['upper'][j]),
+                    'std_error': to_number(result['std_errors'][j])
+                })
+            return {
+                'method': method,
+                'confidence': confidence,
+                'period': {'from': start, 'to': end},
+                'records': len(hacks),
+                'total_hacks': int(hacks.sum()),
+                'items': items
+            }
+
+        return self._cached_analysis(('rates', method, confidence, start, end), compute)
+
+    @timed('tracker_operation_duration_seconds', operation='compare_drop_rates')
+    def compare_drop_rates(self, period_a: tuple, period_b: tuple, method: str = 'normal',
+                           confidence: float = 0.95) -> Dict:
+        """
+        比較兩段期間（各為 (start, end)）的掉落率，difference 為 B − A，
+        附差值的信賴區間、比值與雙尾 p 值；結果依資料版本快取
+        """
+        from drop_rates import compare_drop_rates, to_number
+
+        def compute():
+            hacks_a, columns_a = self._analysis_arrays(*period_a)
+            hacks_b, columns_b = self._analysis_arrays(*period_b)
+            result = compare_drop_rates(hacks_a, columns_a, hacks_b, columns_b, method, confidence)
+            items = []
+            for j, column in enumerate(self.item_columns):
+                items.append({
+                    'column': column,
+                    'name': self.item_names.get(column, column),
+                    'rate_a': to_number(result['a']['rates'][j]),
+                    'rate_b': to_number(result['b']['rates'][j]),
+                    'difference': to_number(result['difference'][j]),
+                    'lower': to_number(result['lower'][j]),
+                    'upper': to_number(result['upper'][j]),
+                    'ratio': to_number(result['ratio'][j]),
+                    'p_value': to_number(result['p_values'][j])
+                })
+            return {
+                'method': method,
+                'confidence': confidence,
+                'period_a': {'from': period_a[0], 'to': period_a[1], 'records': len(hacks_a),
+                             'total_hacks': int(hacks_a.sum())},
+                'period_b': {'from': period_b[0], 'to': period_b[1], 'records': len(hacks_b),
+                             'total_hacks': int(hacks_b.sum())},
+                'items': items
+            }
+
+        return self._cached_analysis(('compare', method, confidence, tuple(period_a), tuple(period_b)), compute)
+
+    @staticmethod
+    def _encode_cursor(timestamp: str, index: int) -> str:
+        return base64.urlsafe_b64encode(f"{index}:{timestamp}".encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        try:
+            index, timestamp = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split(':', 1)
+            return timestamp, int(index)
+        except Exception:
+            raise ValueError(f"無效的游標：{cursor}")
+
+    def latest_cursor(self) -> Optional[str]:
+        """目前最後一筆記錄（依時間排序）的游標"""
+        with self._write_lock:
+            order = self.hack_data.sorted_indices()
+            if not order:
+                return None
+            return self._encode_cursor(self.hack_data.sort_key(order[-1]), order[-1])
+
+    def get_records_page(self, cursor: Optional[str] = None, since: Optional[str] = None,
+                         limit: int = 500, fields: Optional[List[str]] = None) -> Dict:
+        """
+        依時間排序分頁取得記錄。
+        cursor：接續上一頁回傳的 next_cursor；since：只取時間戳記晚於此值的記錄
+        （與區間匯出相同，以解析後的時間比較）；fields：只回傳指定欄位
+        """
+        if fields is not None:
+            allowed = ['timestamp'] + self.hack_data.int_columns
+            unknown = [field for field in fields if field not in allowed]
+            if unknown:
+                raise ValueError(f"未知的欄位：{', '.join(unknown)}")
+        if limit <= 0:
+            raise ValueError("limit 必須大於 0")
+        since_key, _ = range_bound_keys(since, None)
+
+        # 排序索引的重建與分頁都在寫入鎖內，同時新增的記錄不會漏掉
+        with self._write_lock:
+            store = self.hack_data
+            order = store.sorted_indices()
+            # 二分搜尋起始位置：第一筆排序鍵大於游標（或 since）的記錄
+            lo, hi = 0, len(order)
+            if cursor:
+                key = self._decode_cursor(cursor)
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if (store.sort_key(order[mid]), order[mid]) <= key:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+            elif since_key:
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    if store.sort_key(order[mid]) <= since_key:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+            page = order[lo:lo + limit]
+            records = [store.record(index, fields) for index in page]
+            next_cursor = self._encode_cursor(store.sort_key(page[-1]), page[-1]) if page else cursor
+            return {
+                'records': records,
+                'next_cursor': next_cursor,
+                'has_more': lo + limit < len(order),
+                'total_records': len(order)
+            }
+
+    def get_timeseries(self, bucket: str = 'day', start: Optional[str] = None,
+                       end: Optional[str] = None) -> List[Dict]:
+        """取得依小時／日／週彙總的趨勢資料（from / to 皆包含）"""
+        return self.hack_data.rollups.query(bucket, start, end)
+    
     def show_item_stats(self):
         """顯示物資統計表格"""
         if not self.hack_data:
             print("⚠️ 沒有資料可以顯示！")
             return
         
-        stats = self.get_stats()
-        total_hacks = stats['total_hacks']
-        total_items = stats['total_items']
+        item_stats = self.get_item_stats()
         
         print("\n" + "="*80)
         print("📋 詳細物資統計")
@@ -400,58 +1480,32 @@ class IngressHackTracker:
         print(f"{'物資名稱':<15} {'總獲得量':<10} {'佔總物資比例':<15} {'平均每次Hack獲得量':<20}")
         print("-"*80)
         
-        for column in self.item_columns:
-            total = sum(record.get(column, 0) for record in self.hack_data)
-            if total > 0:
-                percentage = (total / total_items * 100) if total_items > 0 else 0
-                avg_per_hack = total / total_hacks if total_hacks > 0 else 0
-                
-                item_name = self.item_names.get(column, column)
-                print(f"{item_name:<15} {total:<10} {percentage:<14.2f}% {avg_per_hack:<20.2f}")
+        for item in item_stats['items']:
+            if item['total'] > 0:
+                print(f"{item['name']:<15} {item['total']:<10} {item['percentage']:<14.2f}% {item['avg_per_hack']:<20.2f}")
         
         print("="*80)
     
+    @timed('tracker_operation_duration_seconds', operation='plot_item_chart')
     def plot_item_chart(self, save_path: str = "item_chart.png"):
         """繪製物資統計圖表"""
         if not self.hack_data:
             print("⚠️ 沒有資料可以繪圖！")
             return
         
-        # 計算各物資總量
-        item_totals = {}
-        for column in self.item_columns:
-            total = sum(record.get(column, 0) for record in self.hack_data)
-            if total > 0:
-                item_totals[self.item_names.get(column, column)] = total
-        
-        if not item_totals:
+        if self.hack_data.total_items == 0:
             print("⚠️ 沒有物資資料可以繪圖！")
             return
         
+        import matplotlib.pyplot as plt
+        
         # 設定中文字型
         plt.rcParams['font.sans-serif'] = ['Microsoft JhengHei', 'SimHei', 'DejaVu Sans']
         plt.rcParams['axes.unicode_minus'] = False
         
         # 創建圖表
         fig, ax = plt.subplots(figsize=(12, 8))
-        
-        items = list(item_totals.keys())
-        values = list(item_totals.values())
-        
-        bars = ax.bar(items, values, color='skyblue', edgecolor='navy', alpha=0.7)
-        
-        # 在每個柱子上顯示數值
-        for bar, value in zip(bars, values):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.5,
-                   f'{value}', ha='center', va='bottom')
-        
-        ax.set_title('Ingress Portal Hack 物資獲得統計', fontsize=16, fontweight='bold')
-        ax.set_xlabel('物資類型', fontsize=12)
-        ax.set_ylabel('獲得數量', fontsize=12)
-        
-        # 旋轉 x 軸標籤以避免重疊
-        plt.xticks(rotation=45, ha='right')
+        self._draw_item_chart(ax)
         
         # 調整版型
         plt.tight_layout()
@@ -493,145 +1547,373 @@ class IngressHackTracker:
             return False
         
         try:
-            with open(filename, 'r', encoding='utf-8-sig') as f:
-                csv_content = f.read()
-            
-            lines = csv_content.strip().split('\n')
-            if len(lines) < 2:
+            with open(filename, 'r', encoding='utf-8-sig', newline='') as f:
+                added, rows = self.ingest_csv_stream(f)
+            if not rows:
                 print("❌ CSV 檔案格式不正確！")
                 return False
             
-            headers = [h.strip() for h in lines[0].split(',')]
-            imported_data = []
-            
-            for line in lines[1:]:
-                if line.strip():
-                    values = line.split(',')
-                    record = {}
-                    for i, header in enumerate(headers):
-                        if header == 'timestamp':
-                            record[header] = values[i].strip()
-                        else:
-                            record[header] = int(values[i]) if values[i].strip() else 0
-                    imported_data.append(record)
-            
-            # 合併資料（避免重複）
-            existing_timestamps = {r['timestamp'] for r in self.hack_data}
-            new_records = [r for r in imported_data if r['timestamp'] not in existing_timestamps]
-            
-            self.hack_data.extend(new_records)
-            self.save_data()
-            
-            print(f"✅ 成功匯入 {len(new_records)} 筆新記錄！")
+            print(f"✅ 成功匯入 {added} 筆新記錄！")
             return True
             
         except Exception as e:
             print(f"❌ 匯入 CSV 失敗：{e}")
             return False
+
+    def export_to_json(self, filename: str = None) -> bool:
+        """匯出資料到 JSON（記錄陣列，與舊版資料檔格式相同）"""
+        if not self.check_auth():
+            return False
+
+        if filename is None:
+            filename = f"ingress_hack_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(list(self.hack_data), f, ensure_ascii=False, indent=2)
+            print(f"📥 JSON 檔案已匯出：{filename}")
+            return True
+        except Exception as e:
+            print(f"❌ 匯出 JSON 失敗：{e}")
+            return False
+
+    def import_from_json(self, filename: str) -> bool:
+        """從 JSON（記錄陣列，例如舊版資料檔）匯入資料，已存在的記錄會略過"""
+        if not self.check_auth():
+            return False
+
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if not isinstance(records, list):
+                print("❌ JSON 檔案格式不正確！")
+                return False
+
+            new_records = []
+            with self._write_lock:
+                for record in records:
+                    if isinstance(record, dict) and not self.hack_data.contains(record):
+                        self.hack_data.append(record)
+                        new_records.append(record)
+                self.append_records(new_records)
+            print(f"✅ 成功匯入 {len(new_records)} 筆新記錄！")
+            return True
+        except Exception as e:
+            print(f"❌ 匯入 JSON 失敗：{e}")
+            return False
+
+    def iter_csv_lines(self, start: Optional[str] = None, end: Optional[str] = None,
+                       indices: Optional[List[int]] = None):
+        """
+        逐行產生 CSV 內容（不含換行），第一行為標題。
+        指定 start / end（ISO 時間字串，皆包含；只給日期時 end 含當天）時依時間排序輸出區間內的記錄，
+        指定 indices 時只輸出這些列，否則依新增順序輸出全部記錄。
+        呼叫當下在鎖內固定要輸出的列與欄位，之後串流期間的新增、清空或重新載入都不影響這次輸出；
+        區間無法解析時在呼叫當下拋出 ValueError
+        """
+        headers = ['timestamp', 'hackCount'] + self.item_columns
+        with self._write_lock:
+            # clear／load_columns 會換成新的 list 與 array，持有舊的參照即可讀到一致的內容
+            store = self.hack_data
+            timestamps = store.timestamps
+            columns = [store.columns[header] for header in headers[1:]]
+            if indices is None and start is None and end is None:
+                indices = range(len(store))
+            elif indices is None:
+                indices = self._range_indices(start, end)
+            else:
+                indices = list(indices)
+        
+        def lines():
+            yield ','.join(headers)
+            for index in indices:
+                yield timestamps[index] + ',' + ','.join(str(column[index]) for column in columns)
+        
+        return lines()
+    
+    def _range_indices(self, start: Optional[str] = None, end: Optional[str] = None):
+        """
+        時間區間內（皆包含；只給日期時 end 含當天）的列索引，依時間排序（需持有 _write_lock）。
+        以解析後的時間比較，不同格式的時間戳記混在一起也與趨勢統計一致；無法解析時間的記錄不在任何區間內
+        """
+        store = self.hack_data
+        order = store.sorted_indices()
+        start_key, end_key = range_bound_keys(start, end)
+        # 依排序鍵二分搜尋區間；無法解析的記錄排序鍵為空字串，排在最前面
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key = store.sort_key(order[mid])
+            if key < start_key if start_key else not key:
+                lo = mid + 1
+            else:
+                hi = mid
+        first = lo
+        if end_key is None:
+            return order[first:]
+        lo, hi = first, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if store.sort_key(order[mid]) <= end_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return order[first:lo]
     
+    @timed('tracker_operation_duration_seconds', operation='generate_csv_content')
     def generate_csv_content(self) -> str:
         """生成 CSV 內容"""
         if not self.hack_data:
             return ''
         
-        headers = ['timestamp', 'hackCount'] + self.item_columns
-        csv_lines = [','.join(headers)]
-        
-        for record in self.hack_data:
-            row = [str(record.get(header, 0)) for header in headers]
-            csv_lines.append(','.join(row))
-        
-        return '\n'.join(csv_lines)
+        return '\n'.join(self.iter_csv_lines())
     
     def clear_all_data(self) -> bool:
-        """清空所有資料"""
+        """清空所有資料（命令列使用，會先要求輸入 YES 確認）"""
         if not self.check_auth():
             return False
         
         confirm = input("⚠️ 確定要清空所有資料嗎？此操作無法復原！(輸入 'YES' 確認): ")
         if confirm == 'YES':
-            self.hack_data = []
-            self.save_data()
-            print("✅ 所有資料已清空！")
-            return True
+            return self.clear_data()
         else:
             print("❌ 操作已取消")
             return False
+
+    def clear_data(self) -> bool:
+        """清空所有資料，不詢問確認（網頁 API 由前端負責確認）"""
+        if not self.check_auth():
+            return False
+        with self._write_lock:
+            self.hack_data.clear()
+            self._dirty_partitions = None
+            self.save_data()
+        print("✅ 所有資料已清空！")
+        return True
     
     def load_from_csv_content(self, csv_content: str) -> int:
         """
         從 CSV 字串內容匯入資料，回傳成功匯入的筆數
         """
-        from datetime import datetime
-        lines = csv_content.strip().split('\n')
-        if len(lines) < 2:
+        added, rows = self.ingest_csv_stream(io.StringIO(csv_content, newline=''))
+        if not rows:
             raise ValueError("CSV 檔案格式不正確！")
-        headers = [h.strip() for h in lines[0].split(',')]
-        has_timestamp = 'timestamp' in headers
-        # 支援自動對應中文欄位名稱
-        hackcount_aliases = ['hackCount', 'Hack次數', 'hack_times', '次數', 'count']
-        hackcount_idx = None
-        for alias in hackcount_aliases:
-            if alias in headers:
-                hackcount_idx = headers.index(alias)
-                break
-        has_hackcount = 'hackCount' in headers or hackcount_idx is not None
-        imported_data = []
-        for line in lines[1:]:
-            if line.strip():
-                values = line.split(',')
-                if len(values) != len(headers):
-                    continue
-                record = {}
-                for i, header in enumerate(headers):
-                    v = values[i].strip()
-                    if header == 'timestamp':
-                        record[header] = v if v else datetime.now().isoformat()
-                    elif header == 'hackCount':
-                        try:
-                            record[header] = int(float(v)) if v else 1
-                        except Exception:
-                            record[header] = 1
-                    else:
-                        try:
-                            record[header] = int(float(v)) if v else 0
-                        except Exception:
-                            record[header] = 0
-                # 若原本就沒有 hackCount 欄，但有別名欄位，則自動補上
-                if not 'hackCount' in record and hackcount_idx is not None:
-                    try:
-                        v = values[hackcount_idx].strip()
-                        record['hackCount'] = int(float(v)) if v else 1
-                    except Exception:
-                        record['hackCount'] = 1
-                elif not has_hackcount:
-                    record['hackCount'] = 1
-                if not has_timestamp:
-                    record['timestamp'] = datetime.now().isoformat()
-                imported_data.append(record)
-        existing_timestamps = {r['timestamp'] for r in self.hack_data}
-        new_records = [r for r in imported_data if r['timestamp'] not in existing_timestamps]
-        self.hack_data.extend(new_records)
-        self.save_data()
-        return len(new_records)
+        return added
 
+    @timed('tracker_operation_duration_seconds', operation='ingest_csv_stream')
+    def check_csv_stream(self, text_stream) -> int:
+        """
+        完整解析一遍 CSV 串流但不寫入，只檢查能否解碼、數值是否在欄位範圍內，回傳資料列數；
+        有問題時拋出與匯入相同的例外（UnicodeDecodeError、ValueError 等）
+        """
+        parser = CsvRecordParser(self.item_columns, self.item_names, content_hash=False)
+        for batch in parser.iter_batches(text_stream):
+            for record in batch:
+                self.hack_data._int_values(record)
+        return parser.rows_read
+
+    def ingest_csv_stream(self, text_stream, checked: bool = False):
+        """
+        以 CsvRecordParser 逐批解析 CSV 串流並逐批寫入資料（略過去重索引中已存在的記錄），
+        回傳 (新增筆數, 讀到的資料列數)。
+        可以 seek 的串流會先以 check_csv_stream 檢查一遍再從頭匯入，解析途中會出錯
+        （例如 UnicodeDecodeError、數值超出範圍）的檔案一筆都不會寫入；
+        checked=True 表示呼叫端已檢查過同樣的內容
+        """
+        if not checked and text_stream.seekable():
+            start = text_stream.tell()
+            self.check_csv_stream(text_stream)
+            text_stream.seek(start)
+        parser = CsvRecordParser(self.item_columns, self.item_names, content_hash=self.content_dedup)
+        added = 0
+        for batch in parser.iter_batches(text_stream):
+            new_records = []
+            with self._write_lock:
+                for record in batch:
+                    # 去重索引隨新增即時更新，同一檔案內的重複列也會略過
+                    if not self.hack_data.contains(record):
+                        self.hack_data.append(record)
+                        new_records.append(record)
+                self.append_records(new_records)
+            added += len(new_records)
+        return added, parser.rows_read
+
+    @timed('tracker_operation_duration_seconds', operation='save_data')
     def save_data(self):
-        """儲存資料到檔案"""
+        """儲存完整資料（JSON 後端會寫入快照並重設日誌）"""
+        with self._write_lock:
+            self._wait_for_writer()
+            try:
+                self.storage.save(self.hack_data)
+            except Exception as e:
+                print(f"⚠️ 儲存資料失敗：{e}")
+                return
+            # 快照已包含延後寫入的記錄，不能再追加一次
+            self._pending = []
+
+    @timed('tracker_operation_duration_seconds', operation='append_records')
+    def append_records(self, records: List[Dict], sync: bool = False):
+        """
+        持久化剛加入 hack_data 的新記錄，成本與歷史資料量無關。
+        sync=True 時確保寫入落到磁碟；開啟延後寫入時記錄交給背景執行緒，sync=True 則等同 flush()
+        """
+        if not records:
+            return
+        with self._write_lock:
+            if self._dirty_partitions is not None:
+                self._dirty_partitions.update(partition_key(record.get('timestamp', '')) for record in records)
+            if self.write_behind:
+                was_empty = not self._pending
+                self._pending.extend(records)
+                if sync:
+                    self._write_pending()
+                else:
+                    self._start_flusher()
+                    # 第一筆記錄進來時叫醒背景執行緒開始計時，累積太多時叫它馬上寫入
+                    if was_empty or len(self._pending) >= FLUSH_MAX_PENDING:
+                        self._flush_wakeup.notify_all()
+                return
+            self._wait_for_writer()
+            try:
+                self.storage.append(self.hack_data, records, sync)
+            except Exception as e:
+                print(f"⚠️ 儲存資料失敗：{e}")
+
+    def pending_count(self) -> int:
+        """延後寫入中、尚未落盤的記錄筆數（含背景正在寫入的那批；只讀取長度，不需要等寫入鎖）"""
+        return len(self._pending) + self._writing
+
+    def _wait_for_writer(self):
+        """等背景寫入執行緒在鎖外寫入的那批寫完（需持有 _write_lock，等待期間會暫時釋放）"""
+        self._flush_wakeup.wait_for(lambda: not self._writing)
+
+    def flush(self) -> bool:
+        """
+        寫入屏障：回傳時，在這之前新增的記錄都已寫入儲存後端並 fsync。
+        沒有開啟延後寫入時記錄本來就已寫入，直接回傳 True
+        """
+        with self._write_lock:
+            return self._write_pending()
+
+    @timed('tracker_operation_duration_seconds', operation='write_pending')
+    def _write_pending(self) -> bool:
+        """把延後寫入的記錄一次寫入（需持有 _write_lock）；失敗時記錄留著下次再寫"""
+        self._wait_for_writer()
+        if not self._pending:
+            return True
+        records, self._pending = self._pending, []
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.hack_data, f, ensure_ascii=False, indent=2)
+            self.storage.append(self.hack_data, records, sync=True)
+            return True
         except Exception as e:
             print(f"⚠️ 儲存資料失敗：{e}")
-    
-    def load_data(self):
-        """從檔案載入資料"""
+            self._pending[:0] = records
+            return False
+
+    def _start_flusher(self):
+        """需要時啟動背景寫入執行緒（需持有 _write_lock）"""
+        if self._flusher is not None:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name='tracker-flush', daemon=True)
+        _write_behind_trackers.add(self)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        """
+        等第一筆記錄進來後再多等最多 FLUSH_INTERVAL 秒，把這段時間內的記錄合併成一次寫入。
+        只在鎖內取走這批記錄，寫檔與 fsync 在鎖外進行，不會擋住新增與查詢；
+        儲存後端需要在鎖內處理（其他 process 改過資料、日誌需要整理）時才改在鎖內寫入
+        """
+        me = threading.current_thread()
+        running = True
+        while running:
+            with self._write_lock:
+                self._flush_wakeup.wait_for(lambda: self._pending or self._flusher is not me)
+                self._flush_wakeup.wait_for(
+                    lambda: len(self._pending) >= FLUSH_MAX_PENDING or self._flusher is not me,
+                    timeout=FLUSH_INTERVAL)
+                running = self._flusher is me
+                self._wait_for_writer()
+                records, self._pending = self._pending, []
+                self._writing = len(records)
+            if not records:
+                continue
+            written = self._write_batch(records)
+            with self._write_lock:
+                self._writing = 0
+                if not written:
+                    self._pending[:0] = records
+                    written = self._write_pending()
+                self._flush_wakeup.notify_all()
+                if not written and running:
+                    # 寫入失敗時稍等再試，不要連續重試
+                    self._flush_wakeup.wait(timeout=FLUSH_INTERVAL)
+
+    @timed('tracker_operation_duration_seconds', operation='write_batch')
+    def _write_batch(self, records: List[Dict]) -> bool:
+        """在寫入鎖外寫入並 fsync 一批記錄；需要改在鎖內寫入或寫入失敗時回傳 False"""
         try:
-            if os.path.exists(self.data_file):
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.hack_data = json.load(f)
+            return self.storage.write_records(self.hack_data, records, sync=True)
         except Exception as e:
-            print(f"⚠️ 載入資料失敗：{e}")
-            self.hack_data = []
+            print(f"⚠️ 儲存資料失敗：{e}")
+            return False
+
+    def _stop_flusher(self):
+        """讓背景寫入執行緒結束（之後有新記錄時會再啟動）"""
+        with self._write_lock:
+            self._flusher = None
+            self._flush_wakeup.notify_all()
+
+    @timed('tracker_operation_duration_seconds', operation='refresh_data')
+    def refresh_data(self) -> bool:
+        """
+        檢查其他 worker（或外部程式）是否修改過資料，有變更時只載入新增的部分；
+        檢查本身只需幾次 stat 或一次 PRAGMA，可在每個請求前呼叫。回傳資料是否有變動
+        """
+        with self._write_lock:
+            if self._writing:
+                # 背景正在寫入，日誌／資料庫的讀取位置還沒更新；下一個請求再檢查
+                return False
+            try:
+                changed = self.storage.refresh(self.hack_data)
+            except Exception as e:
+                print(f"⚠️ 重新載入資料失敗：{e}")
+                return False
+            if changed:
+                # 不知道別的 worker 改了哪些月份，下次上傳時逐一比對
+                self._dirty_partitions = None
+                # 整份重新載入時，還沒寫入的記錄不在檔案裡，要補回記憶體
+                for record in self._pending:
+                    if not self.hack_data.contains(record):
+                        self.hack_data.append(record)
+        return changed
+
+    def close(self):
+        """
+        釋放追蹤器前呼叫：寫入延後寫入的記錄並停止背景寫入執行緒；日誌裡還有未整理的記錄時
+        寫成快照（下次載入不必重播日誌），並清空圖表與分析快取。之後仍可繼續使用，只是快取需要重建
+        """
+        self.flush()
+        self._stop_flusher()
+        if getattr(self.storage, 'journal_entries', 0):
+            self.save_data()
+        with self._chart_lock:
+            self._chart_cache.clear()
+        with self._analytics_lock:
+            self._analytics_cache.clear()
+
+    @timed('tracker_operation_duration_seconds', operation='load_data')
+    def load_data(self):
+        """從儲存後端載入資料（還沒寫入的記錄會先寫入，才不會遺失）"""
+        with self._write_lock:
+            self._write_pending()
+            self._dirty_partitions = None
+            self.hack_data.clear()
+            try:
+                self.storage.load(self.hack_data)
+            except Exception as e:
+                print(f"⚠️ 載入資料失敗：{e}")
+                self.hack_data.clear()
 
 def main():
     """主程式"""
@@ -742,12 +2024,12 @@ if __name__ == "__main__":
     # 檢查必要的套件
     try:
         import matplotlib.pyplot as plt
-        import pandas as pd
+        import numpy as np
         import requests
     except ImportError as e:
         print(f"❌ 缺少必要套件：{e}")
         print("請安裝以下套件：")
-        print("pip install matplotlib pandas requests")
+        print("pip install matplotlib numpy requests")
         exit(1)
     
     main()
\ No newline at end of file
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+背景工作佇列
+把 GitHub 同步／上傳這類會等外部服務的工作丟到背景執行緒，
+API 立即回傳 job id，前端再用 /api/jobs/<id> 查詢結果
+有設定 state_dir 時，工作狀態也會寫成 JSON 檔，多個 worker 行程之間都查得到
+"""
+
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Hashable, Optional
+
+
+class JobQueue:
+    """
+    簡單的背景工作佇列
+    - 同一個 key 已經有排隊中或執行中的工作時，直接回傳那個工作（合併重複請求）
+    - 只保留最近 max_finished 筆已完成的工作結果
+    - state_dir(owner) 回傳存放該使用者工作狀態的資料夾；不設定時只存在記憶體
+    """
+
+    def __init__(self, max_workers: int = 1, max_finished: int = 200,
+                 state_dir: Optional[Callable[[Optional[str]], str]] = None):
+        # 預設只用一個 worker，同步與上傳不會同時改動／讀取資料
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.max_finished = max_finished
+        self.state_dir = state_dir
+        self.jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.active: Dict[Hashable, str] = {}
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable[[], Optional[Dict]], key: Hashable = None,
+               owner: Optional[str] = None) -> Dict:
+        """
+        送出工作，回傳工作狀態（含 job_id）
+        func 回傳的 dict 會放在 result；拋出例外時狀態為 error；owner 為送出工作的使用者
+        """
+        with self.lock:
+            if key is not None and key in self.active:
+                job = self.jobs[self.active[key]]
+                job['coalesced'] += 1
+                return dict(job)
+
+            job = {
+                'job_id': uuid.uuid4().hex,
+                'kind': kind,
+                'owner': owner,
+                'status': 'queued',
+                'result': None,
+                'error': None,
+                'coalesced': 0,
+                'created_at': datetime.now().isoformat(),
+                'finished_at': None
+            }
+            self.jobs[job['job_id']] = job
+            if key is not None:
+                self.active[key] = job['job_id']
+            self._prune()
+            snapshot = dict(job)
+            self._persist(job)
+
+        self.executor.submit(self._run, job['job_id'], func, key)
+        return snapshot
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Dict]:
+        """
+        查詢工作狀態，找不到時回傳 None
+        不在本行程記憶體中的工作（由其他 worker 送出）會從 owner 的狀態檔讀取
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._load(job_id, owner)
+
+    def _state_file(self, job_id: str, owner: Optional[str]) -> Optional[str]:
+        # job_id 來自網址，只接受 uuid hex，避免組出其他路徑
+        if self.state_dir is None or not re.fullmatch(r'[0-9a-f]{32}', job_id or ''):
+            return None
+        return os.path.join(self.state_dir(owner), 'jobs', f'{job_id}.json')
+
+    def _persist(self, job: Dict):
+        """把工作狀態寫到狀態檔（先寫暫存檔再改名，讀取端不會看到寫一半的檔案）"""
+        state_file = self._state_file(job['job_id'], job['owner'])
+        if state_file is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(state_file), exist_ok=True)
+            tmp_file = f"{state_file}.{os.getpid()}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(tmp_file, state_file)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ 儲存工作狀態失敗：{e}")
+
+    def _load(self, job_id: str, owner: Optional[str]) -> Optional[Dict]:
+        state_file = self._state_file(job_id, owner)
+        if state_file is None:
+            return None
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 讀取工作狀態失敗：{e}")
+            return None
+
+    def _run(self, job_id: str, func: Callable[[], Optional[Dict]], key: Hashable):
+        with self.lock:
+            job = self.jobs[job_id]
+            job['status'] = 'running'
+            self._persist(job)
+        try:
+            result, status, error = func(), 'success', None
+        except Exception as e:
+            print(f"⚠️ 背景工作失敗：{e}")
+            result, status, error = None, 'error', str(e)
+        with self.lock:
+            job = self.jobs[job_id]
+            job.update(status=status, result=result, error=error,
+                       finished_at=datetime.now().isoformat())
+            self._persist(job)
+            if key is not None and self.active.get(key) == job_id:
+                del self.active[key]
+
+    def _prune(self):
+        """刪掉最舊的已完成工作（執行中的保留）"""
+        finished = [job_id for job_id, job in self.jobs.items() if job['finished_at']]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            job = self.jobs.pop(job_id)
+            state_file = self._state_file(job_id, job['owner'])
+            if state_file is not None:
+                try:
+                    os.remove(state_file)
+                except OSError:
+                    pass
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+效能指標
+計數器與延遲／大小直方圖，以 Prometheus 文字格式輸出（/api/metrics）。
+每次紀錄只是一次二分搜尋加上幾個整數累加，可以放在每個請求與熱點方法上
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+# 延遲（秒）與大小（bytes）的直方圖分界
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class Histogram:
+    """固定分界的直方圖（各桶計數非累計，輸出時才累加）"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = '') -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """收集計數器、直方圖與即時數值（gauge），並輸出成 Prometheus 文字格式"""
+
+    def __init__(self):
+        # 可重入：gauge 函式在輸出時被呼叫，裡面也可能記錄指標
+        self.lock = threading.RLock()
+        # 名稱 -> (類型, 說明)
+        self.descriptions: Dict[str, Tuple[str, str]] = {}
+        # 名稱 -> {標籤: 值或直方圖}
+        self.series: Dict[str, Dict[Tuple, object]] = {}
+        self.histogram_buckets: Dict[str, Tuple[float, ...]] = {}
+        # 名稱 -> 輸出時才呼叫的取值函式（gauge，以及由其他物件自己累計的計數器）
+        self.value_funcs: Dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str, help_text: str, func: Optional[Callable[[], float]] = None):
+        """計數器；數值由其他物件自己累計時傳入 func，輸出時才呼叫取得目前累計值"""
+        self.descriptions[name] = ('counter', help_text)
+        self.series.setdefault(name, {})
+        if func is not None:
+            self.value_funcs[name] = func
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.descriptions[name] = ('histogram', help_text)
+        self.series.setdefault(name, {})
+        self.histogram_buckets[name] = buckets
+
+    def gauge(self, name: str, help_text: str, func: Callable[[], float]):
+        """輸出時才呼叫 func 取得目前數值"""
+        self.descriptions[name] = ('gauge', help_text)
+        self.value_funcs[name] = func
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series[name]
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.histogram_buckets[name])
+            histogram.observe(value)
+
+    def timed(self, name: str, **labels):
+        """裝飾器：把函式執行時間記到直方圖 name（例外也會記錄，並加上 error 計數）"""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    self.inc('operation_errors_total', **labels)
+                    raise
+                finally:
+                    self.observe(name, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for name, (kind, help_text) in self.descriptions.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                if name in self.value_funcs:
+                    try:
+                        lines.append(f'{name} {_format_number(self.value_funcs[name]())}')
+                    except Exception as e:
+                        print(f"⚠️ 讀取指標 {name} 失敗：{e}")
+                    continue
+                for labels, value in sorted(self.series[name].items()):
+                    if kind == 'counter':
+                        lines.append(f'{name}{_format_labels(labels)} {_format_number(value)}')
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        bucket_labels = _format_labels(labels, 'le="%s"' % bound)
+                        lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                    bucket_labels = _format_labels(labels, 'le="+Inf"')
+                    lines.append(f'{name}_bucket{bucket_labels} {value.count}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {_format_number(value.sum)}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {value.count}')
+        return '\n'.join(lines) + '\n'
+
+
+# 全域共用的指標
+registry = MetricsRegistry()
+registry.histogram('http_request_duration_seconds', 'Flask 請求處理時間')
+registry.histogram('http_response_size_bytes', 'Flask 回應大小（串流回應不列入）', SIZE_BUCKETS)
+registry.counter('http_requests_total', 'Flask 請求數')
+registry.histogram('tracker_operation_duration_seconds', '追蹤器操作耗時')
+registry.counter('operation_errors_total', '操作拋出例外的次數')
+registry.histogram('github_request_duration_seconds', 'GitHub API 請求耗時')
+registry.histogram('github_transfer_bytes', 'GitHub API 傳輸的內容大小', SIZE_BUCKETS)
+
+timed = registry.timed
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+讀取類 API 的回應快取
+以資料版本為準：資料沒變動時直接回傳已序列化（以及 gzip 壓縮過）的回應內容，
+並以 ETag / If-None-Match 讓已有內容的用戶端收到 304
+"""
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Callable
+
+from flask import Response, request
+
+# 小於這個大小的回應不壓縮（gzip 標頭的成本比省下的還多）
+GZIP_MIN_SIZE = 1024
+
+
+class ResponseCache:
+    """
+    以 (範圍, 路徑, 查詢字串) 為鍵快取回應內容，並記下產生時的資料版本；
+    版本不同的內容視為過期。最多 max_entries 筆（LRU）
+    """
+
+    def __init__(self, version_func: Callable[[], int], guard: Callable[[], bool] = None,
+                 max_entries: int = 256, scope_func: Callable[[], str] = None):
+        self.version_func = version_func
+        # guard 回傳 False 時（例如未登入）不使用快取，交給端點自己回應
+        self.guard = guard
+        # scope_func 回傳快取範圍（例如使用者名稱），各範圍的內容與資料版本互不影響
+        self.scope_func = scope_func
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry['version'] != version:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def _put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, scope=None):
+        """清除某個範圍的快取（例如重新載入使用者資料後，版本號會從頭計算）"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == scope]:
+                del self.entries[key]
+
+    def cached(self, view):
+        """裝飾 GET 端點：回應 200 時快取內容，之後同版本的請求直接使用快取"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or (self.guard and not self.guard()):
+                return view(*args, **kwargs)
+            version = self.version_func()
+            scope = self.scope_func() if self.scope_func else None
+            key = (scope, request.path, request.query_string)
+            entry = self._get(key, version)
+            if entry is None:
+                self.misses += 1
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = {
+                    'version': version,
+                    'body': body,
+                    'gzip': None,
+                    'mimetype': response.mimetype,
+                    # 以內容雜湊當 ETag，不同 worker 的資料版本號不一致也不會誤判
+                    'etag': hashlib.sha1(body).hexdigest()
+                }
+                self._put(key, entry)
+            else:
+                self.hits += 1
+            return self._respond(entry)
+        return wrapper
+
+    def _respond(self, entry) -> Response:
+        if entry['etag'] in request.if_none_match:
+            response = Response(status=304)
+        else:
+            body = entry['body']
+            use_gzip = len(body) >= GZIP_MIN_SIZE and 'gzip' in request.accept_encodings
+            if use_gzip:
+                if entry['gzip'] is None:
+                    # 壓縮結果也跟著快取，同版本只壓縮一次
+                    entry['gzip'] = gzip.compress(body, compresslevel=6)
+                body = entry['gzip']
+            response = Response(body, mimetype=entry['mimetype'])
+            if use_gzip:
+                response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(entry['etag'])
+        response.headers['Vary'] = 'Accept-Encoding, Cookie'
+        # 瀏覽器每次都要回來確認（ETag 相同時只會收到 304）
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
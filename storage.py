@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ingress Portal Hack 數據追蹤器 - 資料儲存後端
+binary：二進位欄式快照 + 追加式日誌（預設），啟動時以 mmap 整批載入
+json：JSON 快照 + 追加式日誌
+sqlite：WAL 模式的 SQLite 資料庫，多個 gunicorn worker 可同時讀寫同一份資料
+"""
+
+import io
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import urllib.parse
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows 沒有 fcntl，此時只支援單一 process 寫入
+    fcntl = None
+
+
+def _file_signature(path: str):
+    """檔案的 (inode, mtime, 大小)；不存在時回傳 None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _fsync_dir(path: str):
+    """改名（os.replace）之後 fsync 檔案所在目錄，新的檔名才確定落到磁碟（Windows 不支援，略過）"""
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class JsonJournalStorage:
+    """
+    JSON 快照加上追加式日誌：每筆新資料只在日誌追加一行，
+    日誌筆數追上快照筆數時才整理成新快照，攤銷後每筆寫入仍為 O(1)。
+    多個 process 共用時以檔案鎖串行寫入，並用快照／日誌的 inode、mtime、大小偵測其他 process 的修改
+    """
+
+    def __init__(self, data_file: str, compact_threshold: int = 1000, read_only: bool = False):
+        self.data_file = data_file
+        # 唯讀時不修復日誌，也不寫入任何檔案
+        self.read_only = read_only
+        self.journal_file = data_file + '.journal'
+        self.lock_file = data_file + '.lock'
+        self.compact_threshold = compact_threshold
+        self.journal_entries = 0
+        # 已載入的快照簽章、日誌 inode 與已讀到的日誌位置
+        self._snapshot_signature = None
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._thread_lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_handle = None
+
+    @contextmanager
+    def _locked(self):
+        """跨 process 的寫入鎖（同一 process 內可重入）"""
+        with self._thread_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_handle = open(self.lock_file, 'a')
+                fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_handle is not None:
+                    fcntl.flock(self._lock_handle.fileno(), fcntl.LOCK_UN)
+                    self._lock_handle.close()
+                    self._lock_handle = None
+
+    def load(self, store):
+        """從快照載入資料，再重播日誌"""
+        self._snapshot_signature = None
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                self._snapshot_signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+                self._read_snapshot(f, store)
+        self._replay_journal(store)
+
+    def _read_snapshot(self, f, store):
+        """讀取快照檔內容到 store（子類別可改用其他格式）"""
+        store.extend(json.load(f))
+
+    def _write_snapshot(self, f, store):
+        """把 store 寫成快照檔內容（f 為二進位檔案）"""
+        text = io.TextIOWrapper(f, encoding='utf-8')
+        json.dump(list(store), text, ensure_ascii=False, indent=2)
+        text.flush()
+        text.detach()
+
+    def save(self, store):
+        """寫入完整快照，並重設日誌（compaction）"""
+        with self._locked():
+            self._save(store)
+
+    def _save(self, store):
+        tmp_file = self.data_file + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            self._write_snapshot(f, store)
+            f.flush()
+            os.fsync(f.fileno())
+        # 快照確定落盤後才重設日誌，當機時不會留下重設過的日誌配上沒寫完的快照
+        os.replace(tmp_file, self.data_file)
+        _fsync_dir(self.data_file)
+        self._snapshot_signature = _file_signature(self.data_file)
+        self._reset_journal(len(store))
+
+    def _changed_on_disk(self) -> bool:
+        """快照或日誌是否被其他 process 整個換掉（整理、清空或外部修改）"""
+        journal = _file_signature(self.journal_file)
+        return (_file_signature(self.data_file) != self._snapshot_signature
+                or (journal[0] if journal else None) != self._journal_inode)
+
+    def refresh(self, store) -> bool:
+        """
+        檢查其他 process 是否修改過資料（只需兩次 stat），有變更時：
+        日誌有新增 -> 只重播新增的行；快照被換掉 -> 整份重新載入。回傳資料是否有變動
+        """
+        if self._changed_on_disk():
+            store.clear()
+            self.load(store)
+            return True
+        journal = _file_signature(self.journal_file)
+        if journal and journal[2] > self._journal_offset:
+            return self._read_new_entries(store) > 0
+        return False
+
+    def append(self, store, records: List[Dict], sync: bool = False):
+        """
+        將已加入 store 的新記錄追加到日誌檔（每筆一行）。
+        寫入前會先補上其他 process 新增的記錄；sync=True 時會 fsync，確保寫入落到磁碟
+        """
+        if not records:
+            return
+        with self._locked():
+            if self._changed_on_disk():
+                # 其他 process 已整理或重寫資料：重新載入後再補上這批新記錄
+                store.clear()
+                self.load(store)
+                store.extend(records)
+            else:
+                self._read_new_entries(store)
+            if not os.path.exists(self.journal_file):
+                # 尚無日誌（第一次執行或舊版資料），先寫一次完整快照作為基準
+                self._save(store)
+                return
+            try:
+                lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records)
+                with open(self.journal_file, 'ab') as f:
+                    f.write(lines.encode('utf-8'))
+                    f.flush()
+                    if sync:
+                        os.fsync(f.fileno())
+                    self._journal_offset = f.tell()
+                self.journal_entries += len(records)
+            except OSError as e:
+                print(f"⚠️ 寫入日誌失敗：{e}")
+                self._save(store)
+                return
+            if self.journal_entries >= max(self.compact_threshold, len(store) // 2):
+                self._save(store)
+
+    def write_records(self, store, records: List[Dict], sync: bool = False) -> bool:
+        """
+        只把記錄追加到日誌，不改動 store（追蹤器的背景寫入在自己的寫入鎖外呼叫，只讀取 store 的筆數）。
+        其他 process 改過資料、還沒有日誌或寫入後需要整理時不寫入並回傳 False，呼叫端改在鎖內用 append()
+        """
+        if not records:
+            return True
+        with self._locked():
+            journal = _file_signature(self.journal_file)
+            if (journal is None or self._changed_on_disk() or journal[2] != self._journal_offset
+                    or self.journal_entries + len(records) >= max(self.compact_threshold, len(store) // 2)):
+                return False
+            lines = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+            with open(self.journal_file, 'ab') as f:
+                try:
+                    f.write(lines)
+                    f.flush()
+                    if sync:
+                        os.fsync(f.fileno())
+                except OSError:
+                    # 去掉寫到一半的內容，呼叫端會改在鎖內重寫
+                    f.truncate(self._journal_offset)
+                    raise
+                self._journal_offset = f.tell()
+            self.journal_entries += len(records)
+            return True
+
+    def totals(self) -> Optional[Dict]:
+        """JSON 後端沒有資料庫端的彙總，由記憶體中的累計值提供"""
+        return None
+
+    def _reset_journal(self, base: int):
+        """以目前快照筆數作為基準，重新建立空白日誌"""
+        tmp_file = self.journal_file + '.tmp'
+        header = (json.dumps({'base': base}) + '\n').encode('utf-8')
+        with open(tmp_file, 'wb') as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.journal_file)
+        _fsync_dir(self.journal_file)
+        self._journal_inode = _file_signature(self.journal_file)[0]
+        self._journal_offset = len(header)
+        self.journal_entries = 0
+
+    def _replay_journal(self, store):
+        """重播日誌中快照之後新增的記錄"""
+        self.journal_entries = 0
+        self._journal_inode = None
+        self._journal_offset = 0
+        if not os.path.exists(self.journal_file):
+            return
+        with open(self.journal_file, 'rb') as f:
+            self._journal_inode = os.fstat(f.fileno()).st_ino
+            header = f.readline()
+            if not header.strip():
+                return
+            self._journal_offset = f.tell()
+            if json.loads(header).get('base') != len(store):
+                # 快照已包含這份日誌（整理到一半中斷），不再重播
+                self._journal_offset = os.fstat(f.fileno()).st_size
+                return
+        self._read_new_entries(store)
+
+    def _read_new_entries(self, store) -> int:
+        """從上次讀到的位置繼續讀日誌，只處理完整的行；回傳新增筆數"""
+        if not os.path.exists(self.journal_file):
+            return 0
+        with open(self.journal_file, 'rb') as f:
+            f.seek(self._journal_offset)
+            data = f.read()
+        end = data.rfind(b'\n')
+        if end < 0:
+            return 0
+        self._journal_offset += end + 1
+        added = 0
+        damaged = False
+        for line in data[:end].split(b'\n'):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中斷時可能留下寫到一半的行，略過後重寫快照修復日誌
+                damaged = True
+                continue
+            store.append(record)
+            added += 1
+        self.journal_entries += added
+        if damaged and not self.read_only:
+            self.save(store)
+        return added
+
+
+class BinarySnapshotStorage(JsonJournalStorage):
+    """
+    與 JsonJournalStorage 相同的快照 + 日誌機制，但快照改為二進位欄式格式：
+    標頭、JSON 中繼資料（欄名、非標準欄位、時間彙總）、各整數欄的 int32 陣列、
+    排序索引、內容雜湊的 uint64 陣列，以及以 NUL 分隔的時間戳記。載入時以 mmap 讀取，
+    整數欄直接整塊複製成 array，不需逐筆解析；檔案大小約為每筆 4 bytes × 欄數 + 8 bytes + 時間戳記長度。
+    仍可讀取把內容雜湊放在非標準欄位裡的第 1 版快照。
+    第一次使用時會從舊版 JSON 資料檔（legacy_file）搬移資料
+    """
+
+    MAGIC = b'IHTS'
+    FORMAT_VERSION = 2
+    SUPPORTED_VERSIONS = (1, 2)
+    # magic, 格式版本, 旗標, 欄數, 筆數, 中繼資料長度
+    HEADER = struct.Struct('<4sHHIII')
+    FLAG_ORDER = 1
+    FLAG_HASHES = 2
+
+    def __init__(self, data_file: str, legacy_file: Optional[str] = None, compact_threshold: int = 1000,
+                 read_only: bool = False):
+        super().__init__(data_file, compact_threshold, read_only)
+        self.legacy_file = legacy_file
+
+    def load(self, store):
+        if (self.legacy_file and not os.path.exists(self.data_file)
+                and os.path.exists(self.legacy_file)):
+            with self._locked():
+                if not os.path.exists(self.data_file):
+                    JsonJournalStorage(self.legacy_file).load(store)
+                    self._save(store)
+                    print(f"📦 已將 {self.legacy_file} 轉換為二進位快照 {self.data_file}")
+                    return
+        super().load(store)
+
+    def _read_snapshot(self, f, store):
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            magic, version, flags, n_columns, n_rows, meta_len = self.HEADER.unpack_from(view, 0)
+            if magic != self.MAGIC or version not in self.SUPPORTED_VERSIONS:
+                raise ValueError(f"不支援的快照格式：{self.data_file}")
+            offset = self.HEADER.size
+            meta = json.loads(bytes(view[offset:offset + meta_len]))
+            offset = _align4(offset + meta_len)
+
+            def read_ints(offset, typecode='i'):
+                values = array(typecode)
+                end = offset + values.itemsize * n_rows
+                with view[offset:end] as part:
+                    values.frombytes(part)
+                if sys.byteorder == 'big':
+                    values.byteswap()
+                return values, end
+
+            columns = {}
+            for name in meta['columns']:
+                columns[name], offset = read_ints(offset)
+            order = hashes = None
+            if flags & self.FLAG_ORDER:
+                order, offset = read_ints(offset)
+            if flags & self.FLAG_HASHES:
+                hashes, offset = read_ints(offset, 'Q')
+            (text_len,) = struct.unpack_from('<I', view, offset)
+            offset += 4
+            text = str(view[offset:offset + text_len], 'utf-8')
+            timestamps = text.split('\0') if n_rows else []
+
+        extras = {int(index): extra for index, extra in meta.get('extras', {}).items()}
+        store.load_columns(timestamps, columns, extras, meta.get('rollups'), order, hashes)
+
+    def _write_snapshot(self, f, store):
+        order = store.sorted_indices()
+        meta = json.dumps({
+            'columns': store.int_columns,
+            'extras': store.extras,
+            'rollups': store.rollups.state()
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        f.write(self.HEADER.pack(self.MAGIC, self.FORMAT_VERSION, self.FLAG_ORDER | self.FLAG_HASHES,
+                                 len(store.int_columns), len(store), len(meta)))
+        f.write(meta)
+        f.write(b'\0' * (_align4(self.HEADER.size + len(meta)) - self.HEADER.size - len(meta)))
+
+        for values in [store.columns[name] for name in store.int_columns] + [order, store.hashes]:
+            if sys.byteorder == 'big':
+                values = array(values.typecode, values)
+                values.byteswap()
+            values.tofile(f)
+        text = '\0'.join(store.timestamps).encode('utf-8')
+        f.write(struct.pack('<I', len(text)))
+        f.write(text)
+
+
+def _align4(offset: int) -> int:
+    """整數欄從 4 bytes 對齊的位置開始"""
+    return (offset + 3) & ~3
+
+
+class SqliteStorage:
+    """
+    SQLite（WAL 模式）儲存：每個 worker 各自連線，讀寫可同時進行。
+    totals 表由觸發器在新增／刪除時即時更新，統計查詢直接讀取，不需掃描記錄。
+    其他 worker 的寫入以 PRAGMA data_version 偵測，之後只讀取 seq 大於已載入值的新記錄；
+    整份資料被取代（清空）時 meta 表的 generation 會加一，此時才整份重新載入
+    """
+
+    def __init__(self, db_file: str, item_columns: List[str], legacy_file: Optional[str] = None,
+                 read_only: bool = False):
+        self.db_file = db_file
+        self.item_columns = list(item_columns)
+        self.int_columns = ['hackCount'] + self.item_columns
+        # 第一次使用資料庫時，從這個舊版 JSON 資料檔搬移資料
+        self.legacy_file = legacy_file
+        self._local = threading.local()
+        # 已載入到記憶體的最大 seq 與資料世代
+        self._last_seq = 0
+        self._generation = 0
+        # 唯讀時以 mode=ro 連線，不建立資料表也不搬移舊資料
+        self.read_only = read_only
+        if not read_only:
+            self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每個執行緒各自持有一條連線（自行以 BEGIN / COMMIT 控制交易）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None and self.read_only:
+            uri = 'file:' + urllib.parse.quote(os.path.abspath(self.db_file)) + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        elif conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, conn: sqlite3.Connection, action):
+        """在 IMMEDIATE 交易中執行寫入，失敗時回滾"""
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = action()
+            conn.execute('COMMIT')
+            return result
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _create_schema(self):
+        columns = ', '.join(f'"{c}" INTEGER NOT NULL DEFAULT 0' for c in self.int_columns)
+        totals = ', '.join(f'"{c}" INTEGER NOT NULL DEFAULT 0' for c in self.item_columns)
+        effective_hacks = 'CASE WHEN {0}.hackCount = 0 THEN 1 ELSE {0}.hackCount END'
+        add = ', '.join(f'"{c}" = "{c}" + NEW."{c}"' for c in self.item_columns)
+        subtract = ', '.join(f'"{c}" = "{c}" - OLD."{c}"' for c in self.item_columns)
+        statements = [
+            f'CREATE TABLE IF NOT EXISTS hacks ('
+            f'seq INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, {columns}, extra TEXT)',
+            'CREATE INDEX IF NOT EXISTS idx_hacks_timestamp ON hacks(timestamp)',
+            f'CREATE TABLE IF NOT EXISTS totals ('
+            f'id INTEGER PRIMARY KEY CHECK (id = 0), records INTEGER NOT NULL DEFAULT 0, '
+            f'hacks INTEGER NOT NULL DEFAULT 0, {totals})',
+            'INSERT OR IGNORE INTO totals (id) VALUES (0)',
+            'CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+            f'CREATE TRIGGER IF NOT EXISTS hacks_insert AFTER INSERT ON hacks BEGIN '
+            f'UPDATE totals SET records = records + 1, hacks = hacks + {effective_hacks.format("NEW")}, '
+            f'{add} WHERE id = 0; END',
+            f'CREATE TRIGGER IF NOT EXISTS hacks_delete AFTER DELETE ON hacks BEGIN '
+            f'UPDATE totals SET records = records - 1, hacks = hacks - {effective_hacks.format("OLD")}, '
+            f'{subtract} WHERE id = 0; END',
+        ]
+        conn = self._connect()
+        self._write(conn, lambda: [conn.execute(sql) for sql in statements])
+
+    def _row(self, record: Dict) -> tuple:
+        extra = {k: v for k, v in record.items() if k != 'timestamp' and k not in self.int_columns}
+        return (
+            (str(record.get('timestamp', '')),)
+            + tuple(record.get(c, 1 if c == 'hackCount' else 0) for c in self.int_columns)
+            + (json.dumps(extra, ensure_ascii=False) if extra else None,)
+        )
+
+    def _insert(self, conn: sqlite3.Connection, records) -> None:
+        columns = ', '.join(f'"{c}"' for c in ['timestamp'] + self.int_columns + ['extra'])
+        placeholders = ', '.join('?' for _ in range(len(self.int_columns) + 2))
+        conn.executemany(
+            f'INSERT INTO hacks ({columns}) VALUES ({placeholders})',
+            (self._row(r) for r in records)
+        )
+
+    def _record(self, row) -> Dict:
+        record = {'timestamp': row[0]}
+        record.update(zip(self.int_columns, row[1:-1]))
+        if row[-1]:
+            record.update(json.loads(row[-1]))
+        return record
+
+    def _read_generation(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def _read_rows(self, conn: sqlite3.Connection, after_seq: int = 0):
+        """讀取 seq 大於 after_seq 的記錄，回傳 (記錄列表, 最大 seq)"""
+        columns = ', '.join(f'"{c}"' for c in ['timestamp'] + self.int_columns + ['extra'])
+        cursor = conn.execute(f'SELECT seq, {columns} FROM hacks WHERE seq > ? ORDER BY seq', (after_seq,))
+        records, last_seq = [], after_seq
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            records.extend(self._record(row[1:]) for row in rows)
+            last_seq = rows[-1][0]
+        return records, last_seq
+
+    def load(self, store):
+        """依新增順序載入所有記錄"""
+        conn = self._connect()
+        if self.legacy_file and not self.read_only:
+            self._migrate_legacy(conn)
+        conn.execute('BEGIN')
+        try:
+            self._generation = self._read_generation(conn)
+            records, self._last_seq = self._read_rows(conn)
+        finally:
+            conn.execute('COMMIT')
+        store.extend(records)
+
+    def refresh(self, store) -> bool:
+        """
+        檢查其他 worker 是否寫入過資料，有變更時只載入新增的記錄
+        （資料被整份取代時才重新載入）。回傳資料是否有變動
+        """
+        conn = self._connect()
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == getattr(self._local, 'data_version', None):
+            return False
+        self._local.data_version = data_version
+        conn.execute('BEGIN')
+        try:
+            generation = self._read_generation(conn)
+            reload = generation != self._generation
+            records, last_seq = self._read_rows(conn, 0 if reload else self._last_seq)
+        finally:
+            conn.execute('COMMIT')
+        if reload:
+            store.clear()
+        elif not records:
+            return False
+        store.extend(records)
+        self._generation, self._last_seq = generation, last_seq
+        return True
+
+    def _migrate_legacy(self, conn: sqlite3.Connection):
+        """第一次使用資料庫時，把舊版 JSON 快照與日誌中的資料搬進來（只執行一次）"""
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+            return
+        records = []
+
+        def migrate():
+            # 在寫入鎖內再確認一次，避免多個 worker 同時搬移
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_migrated'").fetchone():
+                return
+            conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_migrated', 1)")
+            legacy = JsonJournalStorage(self.legacy_file)
+            if os.path.exists(legacy.data_file) or os.path.exists(legacy.journal_file):
+                legacy.load(records)
+                self._insert(conn, records)
+
+        self._write(conn, migrate)
+        if records:
+            print(f"📦 已將 {len(records)} 筆舊資料搬移到 {self.db_file}")
+
+    def save(self, store):
+        """以 store 的內容取代資料庫中的全部記錄"""
+        conn = self._connect()
+
+        def replace_all():
+            conn.execute('DELETE FROM hacks')
+            self._insert(conn, store)
+            # 讓其他 worker 知道資料已被整份取代，需要重新載入
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            self._generation = self._read_generation(conn)
+            self._last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM hacks').fetchone()[0]
+
+        self._write(conn, replace_all)
+
+    def append(self, store, records: List[Dict], sync: bool = False):
+        """
+        在同一個交易中新增多筆記錄，並順便補上其他 worker 新增的記錄；
+        sync=True 時以 FULL 同步模式提交
+        """
+        if not records:
+            return
+        conn = self._connect()
+
+        def insert():
+            generation = self._read_generation(conn)
+            reload = generation != self._generation
+            others, _ = self._read_rows(conn, 0 if reload else self._last_seq)
+            self._insert(conn, records)
+            last_seq = conn.execute('SELECT MAX(seq) FROM hacks').fetchone()[0]
+            return generation, reload, others, last_seq
+
+        if sync:
+            conn.execute('PRAGMA synchronous=FULL')
+        try:
+            generation, reload, others, last_seq = self._write(conn, insert)
+        finally:
+            if sync:
+                conn.execute('PRAGMA synchronous=NORMAL')
+        if reload:
+            # 其他 worker 已整份取代資料：以資料庫內容為準，再補上這批新記錄
+            store.clear()
+            store.extend(others)
+            store.extend(records)
+        else:
+            store.extend(others)
+        self._generation, self._last_seq = generation, last_seq
+
+    def write_records(self, store, records: List[Dict], sync: bool = False) -> bool:
+        """
+        只新增記錄，不改動 store（追蹤器的背景寫入在自己的寫入鎖外呼叫）。
+        其他 worker 寫入過或整份取代過資料時不寫入並回傳 False，呼叫端改在鎖內用 append()
+        """
+        if not records:
+            return True
+        conn = self._connect()
+
+        def insert():
+            last_seq = conn.execute('SELECT MAX(seq) FROM hacks').fetchone()[0] or 0
+            if self._read_generation(conn) != self._generation or last_seq != self._last_seq:
+                return None
+            self._insert(conn, records)
+            return conn.execute('SELECT MAX(seq) FROM hacks').fetchone()[0]
+
+        if sync:
+            conn.execute('PRAGMA synchronous=FULL')
+        try:
+            last_seq = self._write(conn, insert)
+        finally:
+            if sync:
+                conn.execute('PRAGMA synchronous=NORMAL')
+        if last_seq is None:
+            return False
+        self._last_seq = last_seq
+        return True
+
+    def totals(self) -> Optional[Dict]:
+        """由資料庫的 totals 表取得累計值（所有 worker 的寫入都已包含在內）"""
+        columns = ', '.join(f'"{c}"' for c in self.item_columns)
+        row = self._connect().execute(f'SELECT records, hacks, {columns} FROM totals WHERE id = 0').fetchone()
+        item_totals = dict(zip(self.item_columns, row[2:]))
+        return {
+            'total_records': row[0],
+            'total_hacks': row[1],
+            'total_items': sum(item_totals.values()),
+            'item_totals': item_totals
+        }
+
+
+def sqlite_file(data_file: str) -> str:
+    """
+    資料檔對應的 SQLite 檔案：預設與資料檔同名、副檔名為 .db。
+    有設定 INGRESS_DB_PATH 時視為資料庫的根目錄（例如掛載的磁碟），底下依資料檔的路徑各自存放，
+    每位使用者仍然是各自的資料庫
+    """
+    stem = os.path.splitext(data_file)[0]
+    base = os.environ.get('INGRESS_DB_PATH')
+    if not base:
+        return stem + '.db'
+    relative = os.path.relpath(os.path.abspath(stem))
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        # 不在目前目錄底下的資料檔以完整路徑區分
+        relative = os.path.splitdrive(os.path.abspath(stem))[1].lstrip(os.sep)
+    return os.path.join(base, relative + '.db')
+
+
+def create_storage(kind: Optional[str], data_file: str, item_columns: List[str]):
+    """
+    依設定建立儲存後端。kind 未指定時讀取環境變數 INGRESS_STORAGE（binary / json / sqlite，預設 binary）；
+    二進位快照與資料檔同名、副檔名為 .bin，第一次使用時自動轉換既有的 JSON 資料檔；
+    SQLite 檔案位置見 sqlite_file()
+    """
+    kind = (kind or os.environ.get('INGRESS_STORAGE') or 'binary').lower()
+    if kind == 'binary':
+        return BinarySnapshotStorage(os.path.splitext(data_file)[0] + '.bin', legacy_file=data_file)
+    if kind == 'json':
+        return JsonJournalStorage(data_file)
+    if kind == 'sqlite':
+        db_file = sqlite_file(data_file)
+        os.makedirs(os.path.dirname(db_file) or '.', exist_ok=True)
+        return SqliteStorage(db_file, item_columns, legacy_file=data_file)
+    raise ValueError(f"不支援的儲存後端：{kind}")
+
+
+def open_read_only(kind: Optional[str], data_file: str, item_columns: List[str]):
+    """
+    以唯讀方式開啟既有資料（給只需要讀取、不能改動原檔的地方使用）：
+    不轉換舊版 JSON、不修復日誌、不建立資料庫。依 kind 選擇的後端檔案還不存在時讀取舊版 JSON 資料檔；
+    都沒有資料時回傳 None
+    """
+    kind = (kind or os.environ.get('INGRESS_STORAGE') or 'binary').lower()
+    stem = os.path.splitext(data_file)[0]
+    if kind == 'binary' and os.path.exists(stem + '.bin'):
+        return BinarySnapshotStorage(stem + '.bin', read_only=True)
+    if kind == 'sqlite':
+        db_file = sqlite_file(data_file)
+        if os.path.exists(db_file):
+            return SqliteStorage(db_file, item_columns, read_only=True)
+    if kind not in ('binary', 'json', 'sqlite'):
+        raise ValueError(f"不支援的儲存後端：{kind}")
+    if os.path.exists(data_file) or os.path.exists(data_file + '.journal'):
+        return JsonJournalStorage(data_file, read_only=True)
+    return None
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+# 專案的模組都放在最上層，測試直接 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在暫存目錄執行（追蹤器會在目前目錄讀寫 github_config.json 等檔案）"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def tracker(workdir):
+    from ingress_tracker import IngressHackTracker
+    tracker = IngressHackTracker(data_file=str(workdir / 'data.json'))
+    tracker.authenticated = True
+    yield tracker
+    tracker.close()
+
+
+@pytest.fixture
+def app_module(workdir, monkeypatch):
+    """每個測試各自的使用者資料夾與追蹤器池"""
+    import app as app_module
+    from tracker_pool import TrackerPool
+    monkeypatch.setattr(app_module, 'USER_DATA_DIR', str(workdir / 'user_data'))
+    monkeypatch.setattr(app_module, 'trackers', TrackerPool(app_module.create_user_tracker))
+    app_module.response_cache.entries.clear()
+    yield app_module
+    app_module.trackers.close_all()
+
+
+def login(client, username='tulacu', password='611450'):
+    response = client.post('/api/login', json={'username': username, 'password': password})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def client(app_module):
+    return login(app_module.app.test_client())
@@ -0,0 +1,206 @@
+import gzip
+import json
+import time
+
+import pytest
+
+from conftest import login
+
+
+def test_stats_endpoints_provide_dashboard_fields(client):
+    """前端（index.html、indexlocal.html、templates/index.html）只讀取這兩個端點的欄位"""
+    assert client.post('/api/data', json={'hackCount': 2, 'L7Res': 3, 'Virus': 1}).status_code == 200
+
+    stats = client.get('/api/stats').get_json()
+    assert (stats['total_records'], stats['total_hacks'], stats['total_items']) == (1, 2, 4)
+    assert stats['avg_items_per_hack'] == 2.0
+
+    items = {item['column']: item for item in client.get('/api/stats/items').get_json()['items']}
+    assert items['L7Res']['total'] == 3
+    assert items['L7Res']['percentage'] == 75.0
+    assert items['L7Res']['avg_per_hack'] == 1.5
+    assert items['L7Res']['name'] == 'L7 共振器'
+
+
+def test_upload_csv_returns_summary_instead_of_records(client):
+    csv_text = 'timestamp,Hack次數,L7 共振器\n2024/01/01 10:00,1,2\n'
+    data = client.post('/api/upload_csv', data={'csv': csv_text}).get_json()
+    assert data['status'] == 'success'
+    assert data['added'] == 1 and data['total_records'] == 1
+    assert 'data' not in data
+    assert client.get('/api/stats/items').get_json()['items'][0]['total'] == 2
+
+
+def test_overflowing_value_is_rejected(client):
+    response = client.post('/api/data', json={'hackCount': 1, 'L7Res': 10 ** 10})
+    assert response.status_code == 400
+    assert client.get('/api/data').status_code == 200
+    assert client.get('/api/stats').get_json()['total_records'] == 0
+
+
+def test_batch_rejects_values_above_int32(client):
+    response = client.post('/api/data/batch', json=[{'hackCount': 1, 'L7Res': 1},
+                                                    {'hackCount': 1, 'L8Res': 2 ** 31}])
+    assert response.status_code == 400
+    assert client.get('/api/stats').get_json()['total_records'] == 0
+
+
+def test_delete_clears_without_prompt(client, monkeypatch):
+    def no_stdin(*args):
+        raise EOFError
+    monkeypatch.setattr('builtins.input', no_stdin)
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 1})
+
+    assert client.delete('/api/data').status_code == 200
+    assert client.get('/api/stats').get_json()['total_records'] == 0
+
+
+def test_new_user_is_seeded_read_only_without_github_credentials(app_module, workdir):
+    shared = workdir / 'ingress_hack_data.json'
+    shared.write_text(json.dumps([{'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 2}]))
+    (workdir / 'github_config.json').write_text(json.dumps({'repo': 'team/data', 'token': 'secret',
+                                                            'filename': 'data.csv'}))
+    before = sorted(path.name for path in workdir.iterdir())
+
+    client = login(app_module.app.test_client())
+    assert client.get('/api/stats').get_json()['total_records'] == 1
+    assert 'token' not in client.get('/api/github/config').get_json()
+    # 共用的資料檔沒有被轉換或改動
+    assert sorted(path.name for path in workdir.iterdir() if path.name != 'user_data') == before
+    assert json.loads(shared.read_text())[0]['L7Res'] == 2
+
+
+def test_bootstrap_drop_rates_run_as_background_job(client):
+    pytest.importorskip('numpy')
+    client.post('/api/data/batch', json=[{'timestamp': f'2024-01-0{day}T10:00:00', 'L7Res': day}
+                                         for day in range(1, 6)])
+
+    response = client.get('/api/stats/drop-rates?method=bootstrap')
+    assert response.status_code == 202
+    job = response.get_json()
+    # 相同參數的請求合併成同一個工作
+    assert client.get('/api/stats/drop-rates?method=bootstrap').get_json()['job_id'] == job['job_id']
+
+    status_url, deadline = job['status_url'], time.monotonic() + 30
+    while job['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+        job = client.get(status_url).get_json()
+    assert job['status'] == 'success'
+    items = {item['column']: item for item in job['result']['items']}
+    assert items['L7Res']['total'] == 15
+
+    assert client.get('/api/stats/drop-rates?method=bootstrap&from=someday').status_code == 400
+    assert client.get('/api/stats/drop-rates/compare?method=bootstrap&a_to=2024-01-02').status_code == 202
+
+
+def test_cached_response_returns_not_modified_until_data_changes(client):
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 1})
+    first = client.get('/api/stats')
+    etag = first.headers['ETag']
+    assert first.headers['Vary'] == 'Accept-Encoding, Cookie'
+
+    cached = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert cached.status_code == 304 and cached.get_data() == b''
+
+    # 資料版本改變後舊內容作廢：同一個 ETag 也會拿到新的內容
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 1})
+    fresh = client.get('/api/stats', headers={'If-None-Match': etag})
+    assert fresh.status_code == 200
+    assert fresh.headers['ETag'] != etag
+    assert fresh.get_json()['total_records'] == 2
+
+
+def test_cached_response_is_gzipped_only_when_accepted(client):
+    plain = client.get('/api/stats/items')
+    assert len(plain.get_data()) >= 1024
+    assert 'Content-Encoding' not in plain.headers
+
+    compressed = client.get('/api/stats/items', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == plain.headers['ETag']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+
+    # 太小的回應不壓縮
+    small = client.get('/api/stats', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+
+
+def test_cached_responses_are_scoped_per_user(app_module, client):
+    other = login(app_module.app.test_client(), 'winnietest', 'winnie123')
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 1})
+    other.post('/api/data', json={'hackCount': 3, 'L7Res': 1})
+    # 兩位使用者的資料版本相同，只靠範圍區分
+    assert app_module.trackers.get('tulacu').data_version == app_module.trackers.get('winnietest').data_version
+
+    assert client.get('/api/stats').get_json()['total_hacks'] == 1
+    assert other.get('/api/stats').get_json()['total_hacks'] == 3
+
+
+def test_timeseries_buckets_and_inclusive_bounds(client):
+    response = client.post('/api/data/batch', json=[
+        {'timestamp': '2024-01-01T10:15:00', 'hackCount': 2, 'L7Res': 1},
+        {'timestamp': '2024/01/01 10:45', 'L7Res': 2},
+        {'timestamp': '2024-01-02T09:00:00', 'L8Res': 3},
+        {'timestamp': '2024-01-08T12:00:00', 'L7Res': 1},
+    ])
+    assert response.status_code == 200
+
+    def series(query):
+        data = client.get(f'/api/stats/timeseries?{query}').get_json()
+        return [(point['bucket'], point['records'], point['total_hacks'], point['total_items'])
+                for point in data['series']]
+
+    assert series('bucket=hour') == [('2024-01-01T10:00', 2, 3, 3), ('2024-01-02T09:00', 1, 1, 3),
+                                     ('2024-01-08T12:00', 1, 1, 1)]
+    assert series('bucket=day') == [('2024-01-01', 2, 3, 3), ('2024-01-02', 1, 1, 3), ('2024-01-08', 1, 1, 1)]
+    # 週以星期一為起點
+    assert series('bucket=week') == [('2024-01-01', 3, 4, 6), ('2024-01-08', 1, 1, 1)]
+
+    # 區間頭尾所在的桶都包含在內
+    assert series('bucket=day&from=2024-01-01T23:00:00&to=2024-01-02') == [('2024-01-01', 2, 3, 3),
+                                                                            ('2024-01-02', 1, 1, 3)]
+    assert series('bucket=week&from=2024-01-03&to=2024-01-07') == [('2024-01-01', 3, 4, 6)]
+    assert series('bucket=day&from=2024-01-03&to=2024-01-07') == []
+    items = client.get('/api/stats/timeseries?bucket=day&to=2024-01-01').get_json()['series'][0]['items']
+    assert (items['L7Res'], items['L8Res']) == (3, 0)
+
+    assert client.get('/api/stats/timeseries?bucket=month').status_code == 400
+    assert client.get('/api/stats/timeseries?from=soon').status_code == 400
+
+
+def png_size(png):
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    return int.from_bytes(png[16:20], 'big'), int.from_bytes(png[20:24], 'big')
+
+
+def test_chart_endpoint_renders_png_of_requested_size(client):
+    pytest.importorskip('matplotlib')
+    assert client.get('/api/charts/items.png').status_code == 400  # 沒有資料
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 2, 'L8XMP': 1})
+
+    response = client.get('/api/charts/items.png?width=320&height=240&dpi=80')
+    assert response.status_code == 200
+    assert response.mimetype == 'image/png'
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert png_size(response.get_data()) == (320, 240)
+    # 尺寸超出範圍時夾到上下限
+    assert png_size(client.get('/api/charts/ratio.png?width=10&height=100').get_data()) == (100, 100)
+    assert client.get('/api/charts/pie.png').status_code == 400
+
+
+def test_chart_cache_evicts_least_recently_used(tracker, monkeypatch):
+    pytest.importorskip('matplotlib')
+    import ingress_tracker
+    monkeypatch.setattr(ingress_tracker, 'CHART_CACHE_SIZE', 2)
+    tracker.add_hack_data(1, L7Res=1)
+
+    first = tracker.render_chart('items', 400, 400)
+    tracker.render_chart('items', 500, 400)
+    assert tracker.render_chart('items', 400, 400) is first  # 命中快取，並成為最近使用
+    tracker.render_chart('items', 600, 400)
+    assert [key[2] for key in tracker._chart_cache] == [400, 600]
+
+    # 資料變動後舊版本的圖不再使用
+    tracker.add_hack_data(1, L7Res=1)
+    assert tracker.render_chart('items', 400, 400) is not first
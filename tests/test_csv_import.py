@@ -0,0 +1,92 @@
+import io
+
+import pytest
+
+from ingress_tracker import IngressHackTracker
+
+HEADER = 'timestamp,hackCount,L7Res,L8Res\n'
+
+
+def test_distinct_rows_with_same_timestamp_are_kept(tracker):
+    csv_text = HEADER + '2024/01/01 10:00,1,2,0\n2024/01/01 10:00,1,0,3\n'
+    assert tracker.load_from_csv_content(csv_text) == 2
+    assert len(tracker.hack_data) == 2
+
+
+def test_exact_duplicate_rows_are_imported_once(tracker):
+    csv_text = HEADER + '2024/01/01 10:00,1,2,0\n2024/01/01 10:00,1,2,0\n2024/01/01 10:01,1,2,0\n'
+    assert tracker.load_from_csv_content(csv_text) == 2
+
+
+def test_reimport_and_reload_skip_existing_rows(tracker):
+    csv_text = HEADER + '2024/01/01 10:00,1,2,0\n2024/01/01 10:00,1,0,3\n,1,1,1\n'
+    assert tracker.load_from_csv_content(csv_text) == 3
+    assert tracker.load_from_csv_content(csv_text) == 0
+
+    # 雜湊跟著記錄存檔，重新啟動後仍能去重
+    reloaded = IngressHackTracker(data_file=tracker.data_file)
+    reloaded.authenticated = True
+    assert reloaded.load_from_csv_content(csv_text) == 0
+    assert len(reloaded.hack_data) == 3
+
+
+def test_exported_csv_reimports_without_duplicates(tracker):
+    # 欄位順序、別名不同也算同一筆；沒有雜湊的記錄（API 新增）以時間戳記比對
+    tracker.load_from_csv_content('L7 共振器,timestamp,Hack次數\n2,2024/01/01 10:00,1\n0,2024/01/01 10:00,2\n')
+    tracker.add_hack_data(1, L8Res=1)
+    exported = tracker.generate_csv_content()
+    assert tracker.load_from_csv_content(exported) == 0
+    assert len(tracker.hack_data) == 3
+
+
+def late_big5_csv(rows=5000):
+    """前 64KB 只有 ASCII，最後一列才出現 Big5 文字"""
+    lines = ['timestamp,hackCount,L7Res,note']
+    lines += [f'2024-01-01T00:00:{i:05d},1,1,ok' for i in range(rows)]
+    lines.append('2024-01-02T00:00:00,1,2,' + '共振器')
+    return ('\n'.join(lines) + '\n').encode('cp950')
+
+
+def test_late_non_utf8_bytes_retry_whole_file_with_next_encoding(tracker, tmp_path):
+    content = late_big5_csv()
+    assert len(content) > 64 * 1024
+    copy_path = tmp_path / 'copy.csv'
+
+    assert tracker.load_from_csv(io.BytesIO(content), utf8_copy_path=str(copy_path)) == 5001
+    assert len(tracker.hack_data) == 5001
+    assert copy_path.read_text(encoding='utf-8').endswith('共振器\n')
+
+
+def test_non_seekable_stream_is_spooled_for_retry(tracker):
+    class Unseekable(io.RawIOBase):
+        def __init__(self, data):
+            self.data = io.BytesIO(data)
+
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            return self.data.readinto(buffer)
+
+    assert tracker.load_from_csv(Unseekable(late_big5_csv())) == 5001
+
+
+def test_failed_parse_imports_nothing(tracker):
+    csv_text = HEADER + '2024/01/01 10:00,1,2,0\n' + f'2024/01/01 11:00,1,{2 ** 40},0\n'
+    with pytest.raises(ValueError):
+        tracker.load_from_csv_content(csv_text)
+    assert len(tracker.hack_data) == 0
+
+
+def test_import_is_written_batch_by_batch_and_only_after_checking(tracker, monkeypatch):
+    rows = ''.join(f'2024-01-01T00:00:{i:05d},1,1,0\n' for i in range(2500))
+    with pytest.raises(ValueError):
+        tracker.load_from_csv_content(HEADER + rows + f'2024-01-02T00:00:00,1,{2 ** 40},0\n')
+    assert len(tracker.hack_data) == 0
+
+    written = []
+    real_append = tracker.append_records
+    monkeypatch.setattr(tracker, 'append_records', lambda records, sync=False: (
+        written.append(len(records)), real_append(records, sync)))
+    assert tracker.load_from_csv(io.BytesIO((HEADER + rows).encode())) == 2500
+    assert written == [1000, 1000, 500]
@@ -0,0 +1,25 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import drop_rates
+
+
+@pytest.mark.parametrize('samples', [1, 1000, 10000, 10 ** 7])
+def test_bootstrap_chunk_stays_within_memory_budget(samples):
+    chunk = drop_rates._bootstrap_chunk(samples)
+    assert chunk >= 1
+    assert chunk * samples <= max(drop_rates.BOOTSTRAP_MAX_CELLS, samples)
+
+
+def test_bootstrap_over_many_chunks(monkeypatch):
+    monkeypatch.setattr(drop_rates, 'BOOTSTRAP_MAX_CELLS', 200 * 50)
+    rng = np.random.default_rng(1)
+    hacks = np.ones(5000)
+    columns = [rng.poisson(2.0, 5000).astype(float)]
+
+    resampled = drop_rates.bootstrap_rates(hacks, columns, samples=200)
+    assert resampled.shape == (200, 1)
+    assert np.allclose(resampled, 2.0, atol=0.2)
+    # 固定種子，結果可重現
+    assert np.array_equal(resampled, drop_rates.bootstrap_rates(hacks, columns, samples=200))
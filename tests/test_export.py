@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+TIMESTAMPS = ['2024-01-01T10:00:00', '2024-01-02T10:00:00', '2024-01-03T10:00:00']
+
+
+@pytest.fixture
+def filled(tracker):
+    # 故意亂序加入，區間匯出必須依時間排序
+    tracker.add_hack_data_many([{'timestamp': t, 'L7Res': i} for i, t in zip((2, 0, 1), reversed(TIMESTAMPS))])
+    return tracker
+
+
+def exported_timestamps(tracker, start=None, end=None):
+    lines = list(tracker.iter_csv_lines(start, end))
+    assert lines[0].startswith('timestamp,hackCount,')
+    return [line.split(',')[0] for line in lines[1:]]
+
+
+@pytest.mark.parametrize('start, end, expected', [
+    (None, None, list(reversed(TIMESTAMPS))),          # 沒有區間：依新增順序
+    ('2024-01-02', None, TIMESTAMPS[1:]),              # 只有起點
+    (None, '2024-01-02', TIMESTAMPS[:2]),              # 只有終點（只給日期時含當天）
+    ('2024-01-02', '2024-01-02', TIMESTAMPS[1:2]),
+    ('2024-01-04', None, []),
+    (None, '2023-12-31', []),
+])
+def test_iter_csv_lines_ranges(filled, start, end, expected):
+    assert exported_timestamps(filled, start, end) == expected
+
+
+def test_export_endpoint_with_open_ended_range(client):
+    client.post('/api/data/batch', json=[{'timestamp': t} for t in TIMESTAMPS])
+
+    body = client.get('/api/export/csv?from=2024-01-02').get_data(as_text=True)
+    assert [line.split(',')[0] for line in body.splitlines()[1:]] == TIMESTAMPS[1:]
+
+    compressed = client.get('/api/export/csv?to=2024-01-01&gzip=1').get_data()
+    lines = gzip.decompress(compressed).decode('utf-8').splitlines()
+    assert [line.split(',')[0] for line in lines[1:]] == TIMESTAMPS[:1]
+
+
+def test_ranges_compare_parsed_timestamps(tracker):
+    # 斜線格式的字串排在 ISO 之後，必須依解析後的時間比較
+    tracker.add_hack_data_many([{'timestamp': t} for t in
+                                ('2024-02-20T10:00:00', '2024/01/01 10:00', '2024-01-15T10:00:00')])
+
+    assert exported_timestamps(tracker, '2024-02-15') == ['2024-02-20T10:00:00']
+    assert exported_timestamps(tracker, None, '2024-01-31') == ['2024/01/01 10:00', '2024-01-15T10:00:00']
+    assert exported_timestamps(tracker, '2024/01/01', '2024/01/01') == ['2024/01/01 10:00']
+
+    page = tracker.get_records_page(limit=10, since='2024-01-10')
+    assert [record['timestamp'] for record in page['records']] == ['2024-01-15T10:00:00', '2024-02-20T10:00:00']
+    first = tracker.get_records_page(limit=1)
+    assert first['records'][0]['timestamp'] == '2024/01/01 10:00'
+    rest = tracker.get_records_page(limit=10, cursor=first['next_cursor'])
+    assert [record['timestamp'] for record in rest['records']] == ['2024-01-15T10:00:00', '2024-02-20T10:00:00']
+
+
+def test_export_keeps_snapshot_when_cleared_mid_stream(filled):
+    lines = filled.iter_csv_lines('2024-01-01', None)
+    assert next(lines).startswith('timestamp,')
+    filled.clear_data()
+    filled.add_hack_data_many([{'timestamp': '2025-01-01T10:00:00'}])
+
+    assert [line.split(',')[0] for line in lines] == TIMESTAMPS
+
+
+def test_export_rejects_unparseable_range(client):
+    response = client.get('/api/export/csv?from=yesterday')
+    assert response.status_code == 400
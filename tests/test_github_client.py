@@ -0,0 +1,222 @@
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+from github_client import GitHubClient, git_blob_sha
+from ingress_tracker import IngressHackTracker
+
+REPO = 'owner/repo'
+
+
+class FakeGitHub(BaseHTTPRequestHandler):
+    """只實作 contents／blobs API 用到的部分；檔案內容放在 server.files，請求記在 server.log"""
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=None, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        files, path = self.server.files, self.path.split('/contents/', 1)[-1]
+        self.server.log.append(('GET', path, self.headers.get('If-None-Match')))
+        if '/git/blobs/' in self.path:
+            sha = self.path.rsplit('/', 1)[1]
+            matches = [content for content in files.values() if git_blob_sha(content) == sha]
+            return self.reply(200, matches[0]) if matches else self.reply(404, {})
+        if path not in files:
+            return self.reply(404, {'message': 'Not Found'})
+        content = files[path]
+        sha = git_blob_sha(content)
+        etag = f'"{sha}"'
+        if self.headers.get('If-None-Match') == etag:
+            return self.reply(304)
+        # 和 GitHub 一樣，超過上限的檔案不附內容
+        large = len(content) > self.server.inline_limit
+        self.reply(200, {'sha': sha, 'size': len(content), 'encoding': 'none' if large else 'base64',
+                         'content': '' if large else base64.b64encode(content).decode()}, {'ETag': etag})
+
+    def do_PUT(self):
+        files, path = self.server.files, self.path.split('/contents/', 1)[-1]
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.log.append(('PUT', path, body.get('sha')))
+        if self.server.on_put:
+            self.server.on_put(path)
+        if self.server.fail_puts:
+            self.server.fail_puts -= 1
+            return self.reply(502, {'message': 'bad gateway'})
+        if path in files and body.get('sha') != git_blob_sha(files[path]):
+            return self.reply(409, {'message': 'sha mismatch'})
+        if path not in files and body.get('sha'):
+            return self.reply(422, {'message': 'sha for missing file'})
+        files[path] = base64.b64decode(body['content'])
+        self.reply(201, {'content': {'sha': git_blob_sha(files[path])}})
+
+
+@pytest.fixture
+def github():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGitHub)
+    server.files, server.log, server.inline_limit = {}, [], 1 << 20
+    server.on_put, server.fail_puts = None, 0
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.01}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def requests_for(github, method):
+    return [entry for entry in github.log if entry[0] == method]
+
+
+def test_unchanged_file_returns_not_modified(github):
+    github.files['data.csv'] = b'timestamp,hackCount\n'
+    client = GitHubClient(REPO, 'token', api_url=github.url)
+
+    assert client.get_file('data.csv') == b'timestamp,hackCount\n'
+    assert client.get_file('data.csv') is GitHubClient.NOT_MODIFIED
+    assert github.log[-1][2] == f'"{git_blob_sha(github.files["data.csv"])}"'
+
+    github.files['data.csv'] = b'timestamp,hackCount\n2024-01-01T10:00:00,1\n'
+    assert client.get_file('data.csv').endswith(b'1\n')
+
+
+def test_large_file_falls_back_to_blobs_api(github):
+    github.inline_limit = 10
+    github.files['data.csv'] = b'x' * 100
+    client = GitHubClient(REPO, 'token', api_url=github.url)
+    assert client.get_file('data.csv') == b'x' * 100
+
+
+def test_put_retries_once_after_sha_conflict(github):
+    github.files['data.csv'] = b'v1'
+    client = GitHubClient(REPO, 'token', api_url=github.url)
+    client.get_file('data.csv')
+    # 別人在這之間改了檔案，快取的 sha 過期
+    github.files['data.csv'] = b'v2'
+
+    assert client.put_file('data.csv', b'v3', 'update') is True
+    assert github.files['data.csv'] == b'v3'
+    puts = requests_for(github, 'PUT')
+    assert [put[2] for put in puts] == [git_blob_sha(b'v1'), git_blob_sha(b'v2')]
+
+
+def test_put_skips_identical_content(github):
+    github.files['data.csv'] = b'same'
+    client = GitHubClient(REPO, 'token', api_url=github.url)
+    assert client.put_file('data.csv', b'same', 'update') is False
+    assert requests_for(github, 'PUT') == []
+
+
+def monthly_tracker(workdir, github, name):
+    tracker = IngressHackTracker(data_file=str(workdir / f'{name}.json'),
+                                 config_file=str(workdir / f'{name}_github.json'))
+    tracker.authenticated = True
+    tracker.save_github_config(REPO, 'token', 'hacks.csv', api_url=github.url, layout='monthly')
+    return tracker
+
+
+def test_partitioned_sync_only_transfers_changed_months(workdir, github):
+    uploader = monthly_tracker(workdir, github, 'uploader')
+    reader = monthly_tracker(workdir, github, 'reader')
+    try:
+        uploader.add_hack_data_many([
+            {'timestamp': '2024-01-05T10:00:00', 'L7Res': 1},
+            {'timestamp': '2024-02-05T10:00:00', 'L8Res': 2},
+        ])
+        assert uploader.upload_to_github()
+        assert set(github.files) == {'hacks/manifest.json', 'hacks/2024-01.csv', 'hacks/2024-02.csv'}
+
+        assert reader.sync_from_github()
+        assert len(reader.hack_data) == 2
+
+        # 只改動二月：只上傳二月分區與 manifest，讀取端也只下載二月
+        uploader.add_hack_data_many([{'timestamp': '2024-02-06T10:00:00', 'L7Res': 3}])
+        github.log.clear()
+        assert uploader.upload_to_github()
+        assert sorted(put[1] for put in requests_for(github, 'PUT')) == ['hacks/2024-02.csv', 'hacks/manifest.json']
+
+        github.log.clear()
+        assert reader.sync_from_github()
+        assert len(reader.hack_data) == 3
+        assert [get[1] for get in requests_for(github, 'GET')] == ['hacks/manifest.json', 'hacks/2024-02.csv']
+
+        # 沒有變動時 manifest 回 304，不再下載任何分區
+        github.log.clear()
+        assert reader.sync_from_github()
+        assert [get[1] for get in requests_for(github, 'GET')] == ['hacks/manifest.json']
+    finally:
+        uploader.close()
+        reader.close()
+
+
+def test_months_changed_during_upload_are_uploaded_next_time(workdir, github):
+    tracker = monthly_tracker(workdir, github, 'tracker')
+    try:
+        tracker.add_hack_data_many([{'timestamp': '2024-01-05T10:00:00', 'L7Res': 1}])
+        assert tracker.upload_to_github()
+
+        def add_march(path):
+            github.on_put = None
+            tracker.add_hack_data_many([{'timestamp': '2024-03-05T10:00:00', 'L7Res': 1}])
+        tracker.add_hack_data_many([{'timestamp': '2024-01-06T10:00:00', 'L7Res': 1}])
+        github.on_put = add_march
+        assert tracker.upload_to_github()
+        assert 'hacks/2024-03.csv' not in github.files
+
+        assert tracker.upload_to_github()
+        assert github.files['hacks/2024-03.csv'].count(b'\n') == 1
+    finally:
+        tracker.close()
+
+
+def test_failed_upload_keeps_months_dirty(workdir, github):
+    tracker = monthly_tracker(workdir, github, 'tracker')
+    try:
+        tracker.add_hack_data_many([{'timestamp': '2024-01-05T10:00:00', 'L7Res': 1}])
+        assert tracker.upload_to_github()
+
+        tracker.add_hack_data_many([{'timestamp': '2024-02-05T10:00:00', 'L7Res': 1}])
+        github.fail_puts = 1
+        assert not tracker.upload_to_github()
+        assert 'hacks/2024-02.csv' not in github.files
+
+        assert tracker.upload_to_github()
+        assert 'hacks/2024-02.csv' in github.files
+        assert '2024-02' in json.loads(github.files['hacks/manifest.json'])['partitions']
+    finally:
+        tracker.close()
+
+
+@pytest.mark.parametrize('layout', ['single', 'monthly'])
+def test_sync_downloads_again_after_clear(workdir, github, layout):
+    github.files['hacks.csv'] = b'timestamp,hackCount,L7Res\n2024-01-05T10:00:00,1,1\n'
+    tracker = monthly_tracker(workdir, github, 'tracker')
+    if layout == 'single':
+        tracker.save_github_config(REPO, 'token', 'hacks.csv', api_url=github.url)
+    else:
+        tracker.add_hack_data_many([{'timestamp': '2024-01-05T10:00:00', 'L7Res': 1}])
+        assert tracker.upload_to_github()
+    try:
+        assert tracker.sync_from_github()
+        assert len(tracker.hack_data) == 1
+
+        # 清空後只剩一筆新記錄，遠端沒變也必須重新下載，不能回 304
+        tracker.clear_data()
+        tracker.add_hack_data_many([{'timestamp': '2024-03-01T10:00:00', 'L7Res': 2}])
+        assert tracker.sync_from_github()
+        assert sorted(tracker.hack_data.timestamps) == ['2024-01-05T10:00:00', '2024-03-01T10:00:00']
+    finally:
+        tracker.close()
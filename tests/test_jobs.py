@@ -0,0 +1,47 @@
+import threading
+import time
+
+from jobs import JobQueue
+
+
+def test_job_state_is_visible_to_other_workers(tmp_path):
+    state_dir = lambda owner: str(tmp_path / owner)
+    worker_a = JobQueue(state_dir=state_dir)
+    worker_b = JobQueue(state_dir=state_dir)
+    release = threading.Event()
+
+    job = worker_a.submit('github_sync', lambda: release.wait(5) and {'added': 3}, owner='alice')
+    assert worker_b.get(job['job_id'], owner='alice')['status'] in ('queued', 'running')
+
+    release.set()
+    worker_a.shutdown()
+    finished = worker_b.get(job['job_id'], owner='alice')
+    assert finished['status'] == 'success'
+    assert finished['result'] == {'added': 3}
+    # 其他使用者的資料夾裡沒有這個工作
+    assert worker_b.get(job['job_id'], owner='bob') is None
+
+
+def test_job_id_from_url_cannot_escape_state_dir(tmp_path):
+    queue = JobQueue(state_dir=lambda owner: str(tmp_path / owner))
+    assert queue.get('../../etc/passwd', owner='alice') is None
+    queue.shutdown()
+
+
+def wait_finished(queue, job):
+    deadline = time.monotonic() + 5
+    while queue.get(job['job_id'], owner=job['owner'])['finished_at'] is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_pruned_jobs_remove_state_files(tmp_path):
+    queue = JobQueue(max_finished=1, state_dir=lambda owner: str(tmp_path / owner))
+    first = queue.submit('job', lambda: {}, owner='alice')
+    wait_finished(queue, first)
+    wait_finished(queue, queue.submit('job', lambda: {}, owner='alice'))
+    queue.submit('job', lambda: {}, owner='alice')
+    queue.shutdown()
+
+    assert queue.get(first['job_id'], owner='alice') is None
+    assert not (tmp_path / 'alice' / 'jobs' / f"{first['job_id']}.json").exists()
@@ -0,0 +1,29 @@
+from metrics import MetricsRegistry
+
+
+def test_metrics_require_login(app_module):
+    assert app_module.app.test_client().get('/api/metrics').status_code == 401
+
+
+def test_metrics_accept_bearer_token(app_module, monkeypatch):
+    monkeypatch.setenv('METRICS_TOKEN', 'secret')
+    anonymous = app_module.app.test_client()
+    assert anonymous.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert anonymous.get('/api/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_monotonic_values_are_exposed_as_counters(client):
+    client.post('/api/data', json={'hackCount': 1, 'L7Res': 1})
+    text = client.get('/api/metrics').get_data(as_text=True)
+    for name in ('tracker_pool_loads_total', 'tracker_pool_evictions_total',
+                 'response_cache_hits_total', 'response_cache_misses_total'):
+        assert f'# TYPE {name} counter' in text
+    assert 'tracker_pool_loads_total 1' in text
+    assert 'tracker_pending_writes 0' in text
+
+
+def test_counter_backed_by_function():
+    registry = MetricsRegistry()
+    value = [3]
+    registry.counter('things_total', 'things', lambda: value[0])
+    assert 'things_total 3' in registry.render()
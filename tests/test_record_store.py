@@ -0,0 +1,101 @@
+import sys
+import threading
+
+import pytest
+
+from ingress_tracker import INT_MAX, HackRecordStore, IngressHackTracker
+
+ITEMS = ['L7Res', 'L8Res']
+
+
+def column_lengths(store):
+    return {len(column) for column in store.columns.values()} | {len(store.timestamps)}
+
+
+def test_append_out_of_range_leaves_store_unchanged():
+    store = HackRecordStore(ITEMS)
+    store.append({'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 2})
+    version = store.version
+
+    with pytest.raises(ValueError):
+        store.append({'timestamp': '2024-01-01T11:00:00', 'hackCount': 1, 'L7Res': 10 ** 10})
+    with pytest.raises(ValueError):
+        store.append({'timestamp': '2024-01-01T12:00:00', 'hackCount': INT_MAX + 1})
+
+    assert column_lengths(store) == {1}
+    assert store.version == version
+    assert store.total_items == 2
+    assert '2024-01-01T11:00:00' not in store.timestamp_keys
+    assert store.to_list() == [{'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 2, 'L8Res': 0}]
+
+
+def test_add_hack_data_rejects_overflow_and_persists_nothing(tracker):
+    tracker.add_hack_data(1, L7Res=1)
+    with pytest.raises(ValueError):
+        tracker.add_hack_data(1, L7Res=10 ** 10)
+
+    assert column_lengths(tracker.hack_data) == {1}
+    assert tracker.get_records_page()['records'][0]['L7Res'] == 1
+    reloaded = IngressHackTracker(data_file=tracker.data_file)
+    assert len(reloaded.hack_data) == 1
+
+
+def test_analysis_runs_alongside_inserts(tracker):
+    pytest.importorskip('numpy')
+    tracker.add_hack_data_many([{'timestamp': f'2024-01-01T00:{i // 60:02d}:{i % 60:02d}', 'L7Res': 1}
+                                for i in range(200)])
+    errors = []
+
+    def insert():
+        try:
+            for _ in range(300):
+                tracker.add_hack_data(1, L8Res=1)
+        except Exception as e:  # BufferError 代表有 NumPy view 沒在鎖內使用
+            errors.append(e)
+
+    # 頻繁切換執行緒，讓寫入容易落在 NumPy view 還存在的期間
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        writer = threading.Thread(target=insert)
+        writer.start()
+        while writer.is_alive():
+            tracker._analysis_arrays()
+            tracker._analysis_arrays('2000-01-01', None)
+        writer.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert len(tracker.hack_data) == 500
+
+
+def test_sorted_index_keeps_rows_added_while_paging(tracker):
+    tracker.add_hack_data_many([{'timestamp': f'2024-01-02T00:00:{i % 60:02d}.{i:06d}', 'L7Res': 1}
+                                for i in range(5000)])
+    errors = []
+
+    def insert():
+        try:
+            # 亂序新增讓排序索引失效，讀取端就得重建
+            for i in range(300):
+                tracker.add_hack_data_many([{'timestamp': f'2024-01-01T00:00:00.{i:06d}', 'L7Res': 1}])
+                tracker.add_hack_data(1, L8Res=1)
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        writer = threading.Thread(target=insert)
+        writer.start()
+        while writer.is_alive():
+            tracker.get_records_page(limit=10)
+            tracker.latest_cursor()
+        writer.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert tracker.get_records_page(limit=1)['total_records'] == len(tracker.hack_data) == 5600
+    assert sorted(tracker.hack_data.sorted_indices()) == list(range(5600))
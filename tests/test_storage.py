@@ -0,0 +1,210 @@
+import gc
+import json
+import os
+from array import array
+
+import pytest
+
+from ingress_tracker import CONTENT_HASH_FIELD, HackRecordStore
+import storage
+from storage import BinarySnapshotStorage, JsonJournalStorage, SqliteStorage, open_read_only
+
+ITEMS = ['L7Res']
+
+
+def test_read_only_sqlite_does_not_write(tmp_path):
+    data_file = str(tmp_path / 'data.json')
+    writable = SqliteStorage(str(tmp_path / 'data.db'), ITEMS)
+    store = HackRecordStore(ITEMS)
+    store.append({'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 3})
+    writable.append(store, store.to_list(), sync=True)
+    # 連線關閉時 SQLite 會做 checkpoint 寫入資料庫檔：先確實關閉再記下修改時間
+    del writable
+    gc.collect()
+    modified = os.stat(tmp_path / 'data.db').st_mtime_ns
+
+    reader = open_read_only('sqlite', data_file, ITEMS)
+    loaded = HackRecordStore(ITEMS)
+    reader.load(loaded)
+    assert loaded.to_list() == store.to_list()
+    assert os.stat(tmp_path / 'data.db').st_mtime_ns == modified
+
+
+def test_read_only_without_data_returns_none(tmp_path):
+    assert open_read_only('binary', str(tmp_path / 'data.json'), ITEMS) is None
+
+
+def test_compaction_fsyncs_before_and_after_each_rename(tmp_path, monkeypatch):
+    events = []
+    real_fsync, real_replace = os.fsync, os.replace
+
+    def fsync(fd):
+        events.append('fsync')
+        real_fsync(fd)
+
+    def replace(src, dst):
+        events.append('replace ' + os.path.basename(dst))
+        real_replace(src, dst)
+    monkeypatch.setattr(storage.os, 'fsync', fsync)
+    monkeypatch.setattr(storage.os, 'replace', replace)
+
+    store = HackRecordStore(ITEMS)
+    store.append({'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 3})
+    JsonJournalStorage(str(tmp_path / 'data.json')).save(store)
+    # 暫存檔 fsync → 改名 → 目錄 fsync；快照完成後才換日誌
+    assert events == ['fsync', 'replace data.json', 'fsync', 'fsync', 'replace data.json.journal', 'fsync']
+
+
+def test_content_hashes_are_stored_as_a_column(tmp_path):
+    store = HackRecordStore(ITEMS)
+    store.extend([
+        {'timestamp': '2024-01-01T10:00:00', 'L7Res': 1, CONTENT_HASH_FIELD: '0123456789abcdef'},
+        {'timestamp': '2024-01-01T11:00:00', 'L7Res': 2},
+    ])
+    assert store.extras == {}
+    BinarySnapshotStorage(str(tmp_path / 'data.bin')).save(store)
+
+    loaded = HackRecordStore(ITEMS)
+    BinarySnapshotStorage(str(tmp_path / 'data.bin')).load(loaded)
+    assert loaded.hashes == array('Q', [0x0123456789abcdef, 0])
+    assert loaded.to_list() == store.to_list()
+    # 舊版較長的雜湊只比對前 16 位
+    assert loaded.contains({'timestamp': 'x', CONTENT_HASH_FIELD: '0123456789abcdef0123'})
+    assert loaded.contains({'timestamp': '2024-01-01T11:00:00'})
+    assert not loaded.contains({'timestamp': '2024-01-01T10:00:00', CONTENT_HASH_FIELD: 'ffff'})
+
+
+def test_load_columns_moves_hashes_out_of_legacy_extras():
+    store = HackRecordStore(ITEMS)
+    store.load_columns(['2024-01-01T10:00:00', '2024-01-01T11:00:00'],
+                       {'L7Res': array('i', [1, 2])},
+                       {0: {CONTENT_HASH_FIELD: 'abcdef0123456789ab', 'note': 'x'}, 1: {CONTENT_HASH_FIELD: '1'}})
+    assert store.extras == {0: {'note': 'x'}}
+    assert store.hashes == array('Q', [0xabcdef0123456789, 1])
+    assert store.timestamp_keys == set()
+    assert store.record(0)[CONTENT_HASH_FIELD] == 'abcdef0123456789'
+
+
+def test_db_path_setting_is_a_base_directory_per_data_file(workdir, monkeypatch):
+    monkeypatch.setenv('INGRESS_DB_PATH', str(workdir / 'db'))
+    for user, value in (('alice', 1), ('bob', 2)):
+        backend = storage.create_storage('sqlite', os.path.join('user_data', user, 'data.json'), ITEMS)
+        store = HackRecordStore(ITEMS)
+        store.append({'timestamp': '2024-01-01T10:00:00', 'L7Res': value})
+        backend.append(store, store.to_list())
+
+    assert storage.sqlite_file('user_data/alice/data.json') == str(workdir / 'db' / 'user_data' / 'alice' / 'data.db')
+    for user, value in (('alice', 1), ('bob', 2)):
+        loaded = HackRecordStore(ITEMS)
+        open_read_only('sqlite', os.path.join('user_data', user, 'data.json'), ITEMS).load(loaded)
+        assert [record['L7Res'] for record in loaded] == [value]
+
+
+def test_binary_snapshot_round_trip_keeps_extras_order_and_rollups(tmp_path):
+    store = HackRecordStore(ITEMS)
+    store.extend([
+        {'timestamp': '2024-01-03T10:00:00', 'L7Res': 3, 'note': '第三筆'},
+        {'timestamp': '2024/01/01 10:00', 'hackCount': 2, 'L7Res': 1},
+        {'timestamp': '2024-01-02T10:00:00', 'L7Res': 2},
+    ])
+    order = store.sorted_indices()
+    assert list(order) == [1, 2, 0]
+    path = str(tmp_path / 'data.bin')
+    BinarySnapshotStorage(path).save(store)
+
+    loaded = HackRecordStore(ITEMS)
+    BinarySnapshotStorage(path).load(loaded)
+    assert loaded.to_list() == store.to_list()
+    assert loaded.extras == {0: {'note': '第三筆'}}
+    # 排序索引與時間彙總直接從快照還原，不重新排序或解析
+    assert loaded._order_valid and loaded._order == order
+    assert loaded.rollups.state() == store.rollups.state()
+    assert (loaded.total_hacks, loaded.item_totals) == (store.total_hacks, store.item_totals)
+
+    # 之後新增的記錄接在還原的索引後面
+    loaded.append({'timestamp': '2024-01-04T10:00:00', 'L7Res': 4})
+    assert list(loaded.sorted_indices()) == [1, 2, 0, 3]
+
+
+def test_binary_storage_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / 'data.json'
+    records = [{'timestamp': '2024-01-01T10:00:00', 'hackCount': 1, 'L7Res': 2}]
+    legacy.write_text(json.dumps(records))
+    path = str(tmp_path / 'data.bin')
+
+    store = HackRecordStore(ITEMS)
+    BinarySnapshotStorage(path, legacy_file=str(legacy)).load(store)
+    assert store.to_list() == records
+    assert os.path.exists(path)
+    assert json.loads(legacy.read_text()) == records
+
+    # 已有快照後不再讀取舊檔
+    legacy.write_text(json.dumps(records * 2))
+    reloaded = HackRecordStore(ITEMS)
+    BinarySnapshotStorage(path, legacy_file=str(legacy)).load(reloaded)
+    assert reloaded.to_list() == records
+
+
+def test_sqlite_triggers_keep_totals_in_step_with_rows(tmp_path):
+    items = ['L7Res', 'L8Res']
+    backend = SqliteStorage(str(tmp_path / 'data.db'), items)
+    store = HackRecordStore(items)
+    records = [
+        {'timestamp': '2024-01-01T10:00:00', 'hackCount': 2, 'L7Res': 3, 'L8Res': 0},
+        {'timestamp': '2024-01-01T11:00:00', 'hackCount': 0, 'L7Res': 0, 'L8Res': 4},  # 0 次算 1 次
+    ]
+    store.extend(records)
+    backend.append(store, records)
+    assert backend.totals() == {'total_records': 2, 'total_hacks': 3, 'total_items': 7,
+                                'item_totals': {'L7Res': 3, 'L8Res': 4}}
+    assert backend.totals()['total_hacks'] == store.total_hacks
+
+    # 整份取代時刪除觸發器扣回舊記錄，累計值只剩新內容
+    replacement = HackRecordStore(items, [{'timestamp': '2024-02-01T10:00:00', 'hackCount': 1, 'L7Res': 1}])
+    backend.save(replacement)
+    assert backend.totals() == {'total_records': 1, 'total_hacks': 1, 'total_items': 1,
+                                'item_totals': {'L7Res': 1, 'L8Res': 0}}
+
+
+def worker_pair(kind, tmp_path):
+    """同一份資料的兩個 worker：各自的儲存後端與記憶體中的記錄"""
+    def open_backend():
+        if kind == 'sqlite':
+            return SqliteStorage(str(tmp_path / 'data.db'), ITEMS)
+        return JsonJournalStorage(str(tmp_path / 'data.json'))
+    workers = []
+    for _ in range(2):
+        backend, store = open_backend(), HackRecordStore(ITEMS)
+        backend.load(store)
+        workers.append((backend, store))
+    return workers
+
+
+def record(hour, value=1):
+    return {'timestamp': f'2024-01-01T{hour:02d}:00:00', 'hackCount': 1, 'L7Res': value}
+
+
+@pytest.mark.parametrize('kind', ['sqlite', 'json'])
+def test_refresh_replays_other_workers_appends_and_reloads_after_replace(kind, tmp_path):
+    (writer, written), (reader, seen) = worker_pair(kind, tmp_path)
+    for hour in (1, 2):
+        written.append(record(hour))
+        writer.append(written, [record(hour)])
+    reader.refresh(seen)
+    assert seen.to_list() == [record(1), record(2)]
+
+    # 只補上新增的那筆，已載入的記錄不會重複
+    written.append(record(3))
+    writer.append(written, [record(3)])
+    generation = seen.generation
+    assert reader.refresh(seen)
+    assert seen.to_list() == [record(1), record(2), record(3)]
+    assert seen.generation == generation
+    assert not reader.refresh(seen)
+
+    # 整份取代（例如清空後重存）時整份重新載入
+    replacement = HackRecordStore(ITEMS, [record(9, 5)])
+    writer.save(replacement)
+    assert reader.refresh(seen)
+    assert seen.to_list() == [record(9, 5)]
+    assert seen.generation > generation
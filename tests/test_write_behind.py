@@ -0,0 +1,62 @@
+import os
+import threading
+import time
+
+import pytest
+
+from ingress_tracker import IngressHackTracker
+
+
+def write_behind_tracker(workdir, storage):
+    tracker = IngressHackTracker(data_file=str(workdir / 'data.json'), storage=storage, write_behind=True)
+    tracker.authenticated = True
+    return tracker
+
+
+def test_flusher_fsyncs_outside_the_write_lock(workdir, monkeypatch):
+    tracker = write_behind_tracker(workdir, 'json')
+    tracker.add_hack_data(1, L7Res=1)
+    assert tracker.flush()
+
+    entered, release = threading.Event(), threading.Event()
+    real_fsync = os.fsync
+
+    def slow_fsync(fd):
+        entered.set()
+        release.wait(5)
+        real_fsync(fd)
+    monkeypatch.setattr(os, 'fsync', slow_fsync)
+
+    try:
+        tracker.add_hack_data(1, L7Res=2)
+        assert entered.wait(5)
+        # 背景執行緒卡在 fsync 時，新增、查詢與重新檢查都不用等它
+        started = time.monotonic()
+        tracker.add_hack_data(1, L8Res=3)
+        assert tracker.get_totals()['total_records'] == 3
+        assert tracker.refresh_data() is False
+        assert time.monotonic() - started < 1
+        assert tracker.pending_count() == 2
+    finally:
+        release.set()
+    assert tracker.flush()
+    assert tracker.pending_count() == 0
+    tracker.close()
+
+    reloaded = IngressHackTracker(data_file=tracker.data_file, storage='json')
+    assert [record['L8Res'] for record in reloaded.hack_data] == [0, 0, 3]
+
+
+@pytest.mark.parametrize('storage', ['json', 'binary', 'sqlite'])
+def test_background_batches_reach_storage_once(workdir, storage):
+    tracker = write_behind_tracker(workdir, storage)
+    for i in range(50):
+        tracker.add_hack_data(1, L7Res=i)
+        if i % 10 == 0:
+            time.sleep(0.06)
+            tracker.refresh_data()
+    tracker.close()
+
+    reloaded = IngressHackTracker(data_file=tracker.data_file, storage=storage)
+    assert sorted(record['L7Res'] for record in reloaded.hack_data) == list(range(50))
+    reloaded.close()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每位使用者各自的追蹤器
+第一次用到時才載入，最多同時保留 max_trackers 個（LRU）；淘汰時先把資料寫回再釋放，
+記憶體用量只與同時活躍的使用者數有關
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+
+class TrackerPool:
+    """
+    使用者名稱 -> 追蹤器 的 LRU 快取
+    factory(username) 負責建立並載入追蹤器；載入可能較久，只鎖住該使用者，不影響其他人的請求
+    """
+
+    def __init__(self, factory: Callable[[str], object], max_trackers: int = 8):
+        self.factory = factory
+        self.max_trackers = max(1, max_trackers)
+        self.trackers = OrderedDict()
+        self.lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, username: str):
+        """取得使用者的追蹤器，尚未載入時建立（同一使用者同時只會載入一次）"""
+        with self.lock:
+            tracker = self._lookup(username)
+            if tracker is not None:
+                return tracker
+            user_lock = self._user_locks.setdefault(username, threading.Lock())
+        with user_lock:
+            with self.lock:
+                tracker = self._lookup(username)
+            if tracker is not None:
+                return tracker
+            tracker = self.factory(username)
+            self.put(username, tracker)
+            with self.lock:
+                self.loads += 1
+        return tracker
+
+    def _lookup(self, username: str):
+        tracker = self.trackers.get(username)
+        if tracker is not None:
+            self.trackers.move_to_end(username)
+        return tracker
+
+    def put(self, username: str, tracker):
+        """放入（或替換）使用者的追蹤器，超過上限時淘汰最久沒用的"""
+        with self.lock:
+            previous = self.trackers.pop(username, None)
+            self.trackers[username] = tracker
+            evicted = []
+            while len(self.trackers) > self.max_trackers:
+                evicted.append(self.trackers.popitem(last=False)[1])
+            self.evictions += len(evicted)
+        if previous is not None and previous is not tracker:
+            evicted.append(previous)
+        # 寫回可能需要一點時間，不佔住鎖；還在處理中的請求拿著舊物件也能完成，寫入仍會落到同一份檔案
+        for old in evicted:
+            self._close(old)
+
+    def _close(self, tracker):
+        try:
+            tracker.close()
+        except Exception as e:
+            print(f"⚠️ 釋放追蹤器失敗：{e}")
+
+    def loaded(self) -> List:
+        """目前載入中的追蹤器"""
+        with self.lock:
+            return list(self.trackers.values())
+
+    def close_all(self):
+        """寫回並釋放所有追蹤器（關閉伺服器時使用）"""
+        with self.lock:
+            trackers = list(self.trackers.values())
+            self.trackers.clear()
+        for tracker in trackers:
+            self._close(tracker)
+
+    def __len__(self) -> int:
+        return len(self.trackers)